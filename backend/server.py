@@ -10,14 +10,16 @@ import uuid
 import bcrypt
 import jwt
 import asyncio
+import contextvars
 from datetime import datetime, timedelta, timezone
 from typing import List, Dict, Optional, Union
 import io
+import math
 from io import BytesIO
 import base64
 
 # FastAPI and Pydantic imports
-from fastapi import FastAPI, HTTPException, Depends, File, UploadFile, Query, WebSocket, WebSocketDisconnect, APIRouter
+from fastapi import FastAPI, HTTPException, Depends, File, UploadFile, Query, WebSocket, WebSocketDisconnect, APIRouter, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.staticfiles import StaticFiles
@@ -25,6 +27,7 @@ from fastapi.responses import Response, FileResponse, StreamingResponse
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel, Field, validator
 import uvicorn
+import httpx
 import json
 import websockets
 import pydantic
@@ -386,6 +389,13 @@ async def generate_traditional_pdf(
 SECRET_KEY = os.getenv('JWT_SECRET', 'activus-invoice-secret-key-2025')
 MONGO_URL = os.getenv('MONGO_URL', 'mongodb://localhost:27017')
 PORT = int(os.getenv('PORT', '8001'))
+# Test fixture endpoint is only served outside production and when explicitly enabled
+ENABLE_TEST_FIXTURES = (os.getenv('ENABLE_TEST_FIXTURES') == '1'
+                        and os.getenv('VERCEL_ENV') != 'production')
+# Upper bound on sub-requests accepted by POST /api/batch
+MAX_BATCH_REQUESTS = 20
+# Set while POST /api/batch dispatches its sub-requests, so a batch cannot call itself
+_IN_BATCH = contextvars.ContextVar("in_batch", default=False)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -579,6 +589,101 @@ def create_boq_event_data(item_id: str, billed_quantity: float, available_quanti
         "available_quantity": available_quantity
     }
 
+# Billing validation helpers
+def _line_quantity(line: dict) -> float:
+    """Quantity of an invoice line as a float; raises ValueError if it is not a finite number"""
+    quantity = line.get("quantity", 0)
+    try:
+        if isinstance(quantity, bool):
+            raise TypeError
+        value = float(quantity)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invoice line quantity must be a number, got {quantity!r}")
+    if not math.isfinite(value):
+        raise ValueError(f"Invoice line quantity must be a number, got {quantity!r}")
+    return value
+
+def _boq_number(value) -> Optional[float]:
+    """A stored BOQ quantity as a float, or None if it cannot be used"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+def sum_requested_quantities(boq_items: List[dict], invoice_items: List[dict]) -> List[tuple]:
+    """(boq_item, line key, total quantity) for each BOQ item the invoice lines bill.
+    
+    Lines match a BOQ item by boq_item_id or serial_number against the item's id,
+    serial_number or sr_no. Several lines may bill the same item, so they are summed.
+    Raises ValueError if a matched line's quantity is not a number.
+    """
+    boq_by_key = {}
+    for boq_item in boq_items:
+        for key in (boq_item.get("id"), boq_item.get("serial_number"), boq_item.get("sr_no")):
+            if key is not None:
+                boq_by_key.setdefault(str(key), boq_item)
+    
+    requested_by_item = {}
+    for line in invoice_items:
+        key = line.get("boq_item_id") or line.get("serial_number")
+        boq_item = boq_by_key.get(str(key)) if key is not None else None
+        if boq_item is None:
+            continue
+        entry = requested_by_item.setdefault(id(boq_item), [boq_item, str(key), 0.0])
+        entry[2] += _line_quantity(line)
+    return [tuple(entry) for entry in requested_by_item.values()]
+
+def find_quantity_overflow(boq_items: List[dict], invoice_items: List[dict]) -> Optional[dict]:
+    """Return an OVER_QUANTITY error detail for the first BOQ item billed beyond its remaining quantity"""
+    for boq_item, item_id, requested in sum_requested_quantities(boq_items, invoice_items):
+        total = _boq_number(boq_item.get("quantity", 0))
+        if total is None:
+            continue  # Nothing to check against
+        remaining = round(total - (_boq_number(boq_item.get("billed_quantity")) or 0.0), 3)
+        if round(requested, 3) > remaining:
+            return {
+                "code": "OVER_QUANTITY",
+                "item_id": item_id,
+                "remaining": remaining,
+                "requested": round(requested, 3),
+                "message": f"Quantity {round(requested, 3)} exceeds remaining quantity {remaining} "
+                           f"for BOQ item {item_id}"
+            }
+    return None
+
+def _boq_item_guard(boq_item: dict, requested: float, total: float, prefix: str = "") -> dict:
+    """Conditions matching boq_item in a project's boq_items while it still has room for requested"""
+    conditions = {f"{prefix}{field}": boq_item[field] for field in ("id", "serial_number", "sr_no") if field in boq_item}
+    # Half a rounding step of slack, matching the 3-decimal comparison in find_quantity_overflow
+    limit = total - requested + 0.0005
+    conditions["$or"] = [
+        {f"{prefix}billed_quantity": {"$lte": limit}},
+        {f"{prefix}billed_quantity": {"$exists": False}}
+    ]
+    return conditions
+
+def billed_quantity_update(boq_items: List[dict], invoice_items: List[dict]) -> Optional[dict]:
+    """Arguments for a projects.update_one that adds the invoice lines to each billed item's billed_quantity.
+    
+    Each item is incremented in place through its own array filter, and the filter only matches
+    while every billed item still has room for its lines, so concurrent invoices billing other
+    items (or other BOQ edits) do not conflict. Returns None if no line bills a BOQ item.
+    """
+    match, increments, array_filters = [], {}, []
+    for boq_item, _, requested in sum_requested_quantities(boq_items, invoice_items):
+        total = _boq_number(boq_item.get("quantity", 0))
+        if total is None:
+            continue  # Not checked by find_quantity_overflow either
+        requested = round(requested, 3)
+        name = f"item{len(array_filters)}"
+        match.append({"boq_items": {"$elemMatch": _boq_item_guard(boq_item, requested, total)}})
+        increments[f"boq_items.$[{name}].billed_quantity"] = requested
+        array_filters.append(_boq_item_guard(boq_item, requested, total, prefix=f"{name}."))
+    if not increments:
+        return None
+    return {"filter": {"$and": match}, "update": {"$inc": increments}, "array_filters": array_filters}
+
 # Pydantic Models
 class UserRole:
     ADMIN = "admin"
@@ -1800,7 +1905,7 @@ async def readiness_check():
 api_router = APIRouter(prefix="/api")
 
 # API Health check endpoint
-@api_router.get("/health")
+@api_router.api_route("/health", methods=["GET", "HEAD"])
 async def api_health_check():
     """API health check endpoint"""
     try:
@@ -2068,10 +2173,15 @@ async def upload_boq_file(file: UploadFile = File(...), current_user: dict = Dep
 # ============================================================================
 
 @api_router.get("/projects")
-async def get_projects(current_user: dict = Depends(get_current_user)):
+async def get_projects(
+    current_user: dict = Depends(get_current_user),
+    fields: Optional[str] = Query(None, description="Comma-separated project fields to return (default: all)")
+):
     """Get all projects for the current user"""
     try:
-        projects = await db.projects.find({"user_id": current_user["user_id"]}).to_list(length=None)
+        # Let Mongo drop unrequested fields instead of shipping whole documents
+        projection = {field.strip(): 1 for field in fields.split(",") if field.strip()} if fields else None
+        projects = await db.projects.find({"user_id": current_user["user_id"]}, projection).to_list(length=None)
         
         # Convert MongoDB documents to proper format
         formatted_projects = []
@@ -2093,7 +2203,7 @@ async def create_project(project_data: dict, current_user: dict = Depends(get_cu
     try:
         # Add metadata
         project_data.update({
-            "id": f"proj_{int(datetime.now(timezone.utc).timestamp())}",
+            "id": f"proj_{uuid.uuid4().hex}",  # Unique even for projects created in the same second
             "user_id": current_user["user_id"],
             "created_at": datetime.now(timezone.utc).isoformat(),
             "updated_at": datetime.now(timezone.utc).isoformat(),
@@ -2291,6 +2401,22 @@ async def get_invoices(current_user: dict = Depends(get_current_user)):
 async def create_invoice(invoice_data: dict, current_user: dict = Depends(get_current_user)):
     """Create a new invoice"""
     try:
+        # Reject tax invoice lines that bill more than a BOQ item has left; proforma invoices are not billing
+        project = None
+        billing = None
+        if invoice_data.get("invoice_type") == InvoiceType.TAX_INVOICE:
+            project = await db.projects.find_one({"id": invoice_data.get("project_id"), "user_id": current_user["user_id"]})
+        if project:
+            boq_items = project.get("boq_items", [])
+            invoice_items = invoice_data.get("items") or invoice_data.get("invoice_items") or []
+            try:
+                overflow = find_quantity_overflow(boq_items, invoice_items)
+                billing = billed_quantity_update(boq_items, invoice_items)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            if overflow:
+                raise HTTPException(status_code=400, detail=overflow)
+        
         # Add metadata
         invoice_data.update({
             "id": f"inv_{int(datetime.now(timezone.utc).timestamp())}",
@@ -2303,10 +2429,29 @@ async def create_invoice(invoice_data: dict, current_user: dict = Depends(get_cu
         # Insert into database
         result = await db.invoices.insert_one(invoice_data)
         
+        if billing:
+            # Record the billed quantities, guarded per item so a concurrent invoice that used up
+            # the remaining quantity first withdraws this one instead of over-billing
+            try:
+                reserved = await db.projects.update_one(
+                    {"_id": project["_id"], **billing["filter"]},
+                    billing["update"],
+                    array_filters=billing["array_filters"]
+                )
+            except Exception:
+                await db.invoices.delete_one({"_id": result.inserted_id})
+                raise
+            if reserved.matched_count == 0:
+                await db.invoices.delete_one({"_id": result.inserted_id})
+                raise HTTPException(status_code=409,
+                                    detail="BOQ quantities were billed by another invoice while this one was being created, please retry")
+        
         # Return the created invoice
         invoice_data["_id"] = str(result.inserted_id)
         return {"message": "Invoice created successfully", "invoice": invoice_data}
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error creating invoice: {e}")
         raise HTTPException(status_code=500, detail="Error creating invoice")
@@ -2626,6 +2771,99 @@ async def get_current_user_info(current_user: dict = Depends(get_current_user)):
         logger.error(f"Error fetching current user: {e}")
         raise HTTPException(status_code=500, detail="Error fetching user information")
 
+# ============================================================================
+# TEST FIXTURE API - NON-PRODUCTION ONLY
+# ============================================================================
+
+@api_router.post("/test-fixture")
+async def create_test_fixture(fixture_data: dict):
+    """Log in and create a client plus project in one call for API test suites"""
+    if not ENABLE_TEST_FIXTURES:
+        raise HTTPException(status_code=404, detail="Not Found")
+    
+    try:
+        credentials = UserLogin(**fixture_data.get("credentials", {}))
+    except (TypeError, pydantic.ValidationError):
+        raise HTTPException(status_code=400, detail="credentials must include email and password")
+    client_data = fixture_data.get("client", {})
+    project_data = fixture_data.get("project", {})
+    if not isinstance(client_data, dict) or not isinstance(project_data, dict):
+        raise HTTPException(status_code=400, detail="client and project must be objects")
+    
+    login_result = await login(credentials)
+    current_user = await verify_token(login_result["access_token"])
+    
+    client_result = await create_client(dict(client_data), current_user)
+    client_id = client_result["client"]["id"]
+    
+    project_data = dict(project_data)
+    project_data["client_id"] = client_id
+    project_data.setdefault("created_by", current_user["user_id"])
+    try:
+        project_result = await create_project(project_data, current_user)
+    except HTTPException:
+        # Don't leave a half-built fixture behind
+        await db.clients.delete_one({"id": client_id, "user_id": current_user["user_id"]})
+        raise
+    
+    return {
+        "access_token": login_result["access_token"],
+        "token_type": "bearer",
+        "user": login_result["user"],
+        "client_id": client_id,
+        "project_id": project_result["project"]["id"]
+    }
+
+@api_router.post("/batch")
+async def batch_requests(batch_data: dict, request: Request, current_user: dict = Depends(get_current_user)):
+    """Run several API calls in one round trip through the normal router.
+    
+    Each sub-request is {"method", "path", "body"} with path relative to /api and is
+    authorized with the caller's own token. Sub-requests run concurrently unless the
+    X-Batch-Sequential: true header is sent, in which case they run in order. Each
+    sub-request's failure, including an unhandled error, is reported in its own slot.
+    """
+    # Sub-requests run in this context, so this catches every path spelling that routes here
+    if _IN_BATCH.get():
+        raise HTTPException(status_code=400, detail="Batch requests cannot be nested")
+    
+    sub_requests = batch_data.get("requests")
+    if not isinstance(sub_requests, list) or not sub_requests:
+        raise HTTPException(status_code=400, detail="requests must be a non-empty list")
+    if len(sub_requests) > MAX_BATCH_REQUESTS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_REQUESTS} requests per batch")
+    
+    headers = {"Authorization": request.headers["authorization"]}
+    sequential = request.headers.get("x-batch-sequential", "").lower() == "true"
+    
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    batch_token = _IN_BATCH.set(True)
+    async with httpx.AsyncClient(transport=transport, base_url="http://batch") as client:
+        async def run_one(sub_request):
+            if not isinstance(sub_request, dict):
+                return {"status": 400, "body": {"detail": "Each request must be an object"}}
+            method = str(sub_request.get("method", "GET")).upper()
+            path = str(sub_request.get("path", "")).lstrip("/")
+            if method not in ("GET", "POST", "PUT", "DELETE") or not path:
+                return {"status": 400, "body": {"detail": "Unsupported batch sub-request"}}
+            
+            response = await client.request(method, f"/api/{path}", json=sub_request.get("body"), headers=headers)
+            try:
+                body = response.json()
+            except ValueError:
+                body = response.text
+            return {"status": response.status_code, "body": body}
+        
+        try:
+            if sequential:
+                results = [await run_one(sub_request) for sub_request in sub_requests]
+            else:
+                results = await asyncio.gather(*(run_one(sub_request) for sub_request in sub_requests))
+        finally:
+            _IN_BATCH.reset(batch_token)
+    
+    return {"results": results}
+
 # ============================================================================
 # GST APPROVAL API
 # ============================================================================
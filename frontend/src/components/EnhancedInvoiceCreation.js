@@ -262,7 +262,7 @@ const EnhancedInvoiceCreation = ({ currentUser, projectId, onClose, onSuccess })
                 onSuccess(createdInvoice);
             } else {
                 const errorData = await response.json();
-                setError(errorData.detail || 'Failed to create invoice');
+                setError(errorData.detail?.message || errorData.detail || 'Failed to create invoice');
             }
         } catch (err) {
             console.error('Error creating invoice:', err);
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Request models for the invoice endpoints, used by the API test scripts to check
+payloads locally before they are sent.
+
+The invoice routes in backend/server.py accept plain dicts, so the OpenAPI schema
+only describes them as objects; these models mirror the fields the server reads
+(see InvoiceItem / Invoice and find_quantity_overflow there).
+"""
+
+from typing import List, Literal, Union
+
+from pydantic import BaseModel, Field
+
+# BOQ serial numbers arrive as strings or ints depending on how the BOQ was imported
+SerialNumber = Union[str, int]
+
+class EnhancedInvoiceLine(BaseModel):
+    boq_item_id: SerialNumber
+    serial_number: SerialNumber
+    description: str
+    unit: str
+    quantity: float = Field(gt=0)
+    rate: float = Field(ge=0)
+    amount: float = Field(ge=0)
+
+class InvoiceLine(EnhancedInvoiceLine):
+    gst_rate: float = 18.0
+    gst_amount: float = Field(ge=0)
+    total_with_gst: float = Field(ge=0)
+
+class InvoiceBase(BaseModel):
+    project_id: str
+    project_name: str
+    client_id: str
+    client_name: str
+    invoice_type: Literal["proforma", "tax_invoice"]
+    created_by: str
+    subtotal: float = Field(ge=0)
+    total_gst_amount: float = Field(ge=0)
+    total_amount: float = Field(ge=0)
+
+class InvoiceCreate(InvoiceBase):
+    """Body of POST /api/invoices"""
+    items: List[InvoiceLine] = Field(min_length=1)
+
+class EnhancedInvoiceCreate(InvoiceBase):
+    """Body of POST /api/invoices/enhanced"""
+    invoice_gst_type: Literal["CGST_SGST", "IGST"]
+    invoice_items: List[EnhancedInvoiceLine] = Field(min_length=1)
+    cgst_amount: float = Field(default=0.0, ge=0)
+    sgst_amount: float = Field(default=0.0, ge=0)
+
+class QuantityCheckLine(BaseModel):
+    boq_item_id: SerialNumber
+    description: str
+    quantity: float = Field(gt=0)
+
+class QuantityValidationRequest(BaseModel):
+    """Body of POST /api/invoices/validate-quantities"""
+    project_id: str
+    invoice_items: List[QuantityCheckLine] = Field(min_length=1)
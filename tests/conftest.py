@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+# The backend is a flat set of modules (server.py imports its siblings directly)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+import server  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    """Client for the backend app; not used as a context manager, so startup hooks (database setup) do not run"""
+    return TestClient(server.app, raise_server_exceptions=False)
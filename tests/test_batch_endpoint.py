@@ -0,0 +1,85 @@
+import pytest
+
+import server
+
+AUTH = {"Authorization": "Bearer test-token"}
+
+
+@pytest.fixture
+def client(client):
+    """Batch client with auth stubbed out and two throwaway routes to dispatch to"""
+    async def echo(payload: dict):
+        return {"echo": payload}
+
+    async def boom():
+        raise RuntimeError("sub-handler failure")
+
+    routes_before = list(server.app.router.routes)
+    server.app.add_api_route("/api/_batch_test/echo", echo, methods=["POST"])
+    server.app.add_api_route("/api/_batch_test/boom", boom, methods=["GET"])
+    server.app.dependency_overrides[server.get_current_user] = lambda: {"user_id": "u1", "role": "admin"}
+    try:
+        yield client
+    finally:
+        server.app.dependency_overrides.clear()
+        server.app.router.routes[:] = routes_before
+
+
+def post_batch(client, requests, **headers):
+    return client.post("/api/batch", json={"requests": requests}, headers={**AUTH, **headers})
+
+
+def test_sub_requests_are_dispatched_in_order(client):
+    response = post_batch(client, [
+        {"method": "POST", "path": "/_batch_test/echo", "body": {"n": 1}},
+        {"method": "POST", "path": "_batch_test/echo", "body": {"n": 2}},
+    ], **{"X-Batch-Sequential": "true"})
+    assert response.status_code == 200
+    assert response.json()["results"] == [
+        {"status": 200, "body": {"echo": {"n": 1}}},
+        {"status": 200, "body": {"echo": {"n": 2}}},
+    ]
+
+
+@pytest.mark.parametrize("path", ["/batch", "batch", "./batch", "x/../batch", "%62atch", "batch?x=1"])
+def test_nested_batches_are_rejected(client, path):
+    nested = {"method": "POST", "path": path, "body": {"requests": [{"method": "GET", "path": "/_batch_test/boom"}]}}
+    response = post_batch(client, [nested])
+    assert response.status_code == 200
+    (result,) = response.json()["results"]
+    assert result["status"] == 400
+    assert result["body"]["detail"] == "Batch requests cannot be nested"
+
+
+def test_unhandled_error_is_reported_in_its_own_slot(client):
+    response = post_batch(client, [
+        {"method": "GET", "path": "/_batch_test/boom"},
+        {"method": "POST", "path": "/_batch_test/echo", "body": {"ok": True}},
+    ])
+    assert response.status_code == 200
+    boom, echo = response.json()["results"]
+    assert boom["status"] == 500
+    assert echo == {"status": 200, "body": {"echo": {"ok": True}}}
+
+
+def test_batch_flag_does_not_leak_after_a_batch(client):
+    post_batch(client, [{"method": "POST", "path": "/_batch_test/echo", "body": {}}])
+    assert not server._IN_BATCH.get()
+    response = post_batch(client, [{"method": "POST", "path": "/_batch_test/echo", "body": {}}])
+    assert response.json()["results"][0]["status"] == 200
+
+
+@pytest.mark.parametrize("payload, detail", [
+    ({}, "requests must be a non-empty list"),
+    ({"requests": []}, "requests must be a non-empty list"),
+    ({"requests": [{}] * (server.MAX_BATCH_REQUESTS + 1)}, f"At most {server.MAX_BATCH_REQUESTS} requests per batch"),
+])
+def test_invalid_envelopes_are_rejected(client, payload, detail):
+    response = client.post("/api/batch", json=payload, headers=AUTH)
+    assert response.status_code == 400
+    assert response.json()["detail"] == detail
+
+
+def test_unsupported_sub_requests_get_400(client):
+    response = post_batch(client, ["not-an-object", {"method": "PATCH", "path": "/_batch_test/echo"}, {"method": "GET"}])
+    assert [result["status"] for result in response.json()["results"]] == [400, 400, 400]
@@ -0,0 +1,25 @@
+import pytest
+
+import server
+
+
+class StubDatabase:
+    def __init__(self, error=None):
+        self.error = error
+
+    async def command(self, name):
+        if self.error:
+            raise self.error
+        return {"ok": 1}
+
+
+@pytest.mark.parametrize("method", ["GET", "HEAD"])
+def test_api_health_reports_healthy_database(client, monkeypatch, method):
+    monkeypatch.setattr(server, "db", StubDatabase())
+    assert client.request(method, "/api/health").status_code == 200
+
+
+@pytest.mark.parametrize("method", ["GET", "HEAD"])
+def test_api_health_fails_when_database_is_down(client, monkeypatch, method):
+    monkeypatch.setattr(server, "db", StubDatabase(error=RuntimeError("no primary")))
+    assert client.request(method, "/api/health").status_code == 503
@@ -0,0 +1,87 @@
+import pytest
+
+from server import billed_quantity_update, find_quantity_overflow
+
+
+def boq_item(**fields):
+    return {"id": "boq-1", "serial_number": "1", "sr_no": 1, "quantity": 10.0, "billed_quantity": 0.0, **fields}
+
+
+def test_within_remaining_quantity_is_allowed():
+    assert find_quantity_overflow([boq_item()], [{"boq_item_id": "boq-1", "quantity": 10.0}]) is None
+
+
+def test_lines_billing_the_same_item_are_summed():
+    lines = [{"boq_item_id": "boq-1", "quantity": 6.0}, {"serial_number": "1", "quantity": 5.0}]
+    overflow = find_quantity_overflow([boq_item()], lines)
+    assert overflow["code"] == "OVER_QUANTITY"
+    assert overflow["requested"] == 11.0
+    assert overflow["remaining"] == 10.0
+
+
+@pytest.mark.parametrize("line_key", [
+    {"boq_item_id": "boq-1"},
+    {"boq_item_id": "1"},
+    {"serial_number": "1"},
+    {"boq_item_id": 1},
+])
+def test_lines_match_by_id_serial_number_or_sr_no(line_key):
+    items = [boq_item(id="boq-1", serial_number="1", sr_no=1)]
+    overflow = find_quantity_overflow(items, [{**line_key, "quantity": 10.5}])
+    assert overflow is not None
+    assert overflow["item_id"] == str(next(iter(line_key.values())))
+
+
+def test_lines_match_by_sr_no_alone():
+    items = [{"sr_no": 3, "quantity": 2.0, "billed_quantity": 0.0}]
+    assert find_quantity_overflow(items, [{"boq_item_id": "3", "quantity": 2.0}]) is None
+    assert find_quantity_overflow(items, [{"boq_item_id": "3", "quantity": 2.5}])["item_id"] == "3"
+
+
+def test_unmatched_lines_are_not_checked():
+    assert find_quantity_overflow([boq_item()], [{"boq_item_id": "other", "quantity": 999}]) is None
+
+
+@pytest.mark.parametrize("requested, blocked", [(1.009, False), (1.0091, False), (1.01, True), (7.30, True)])
+def test_rounding_edge_at_1_009_remaining(requested, blocked):
+    items = [boq_item(billed_quantity=8.991)]
+    overflow = find_quantity_overflow(items, [{"boq_item_id": "boq-1", "quantity": requested}])
+    assert (overflow is not None) == blocked
+    if blocked:
+        assert overflow["remaining"] == 1.009
+
+
+@pytest.mark.parametrize("quantity", [None, "abc", float("nan"), True, {}])
+def test_non_numeric_line_quantity_is_rejected(quantity):
+    with pytest.raises(ValueError):
+        find_quantity_overflow([boq_item()], [{"boq_item_id": "boq-1", "quantity": quantity}])
+
+
+def test_unusable_stored_quantities_do_not_raise():
+    assert find_quantity_overflow([boq_item(quantity=None)], [{"boq_item_id": "boq-1", "quantity": 5}]) is None
+    assert find_quantity_overflow([boq_item(billed_quantity=None)], [{"boq_item_id": "boq-1", "quantity": 10}]) is None
+
+
+def test_billed_quantity_update_increments_only_billed_items():
+    items = [boq_item(billed_quantity=8.0), boq_item(id="boq-2", serial_number="2", sr_no=2)]
+    billing = billed_quantity_update(items, [{"boq_item_id": "boq-1", "quantity": 0.5},
+                                             {"serial_number": "1", "quantity": 0.25}])
+    assert billing["update"] == {"$inc": {"boq_items.$[item0].billed_quantity": 0.75}}
+    [array_filter] = billing["array_filters"]
+    assert {key: array_filter[key] for key in ("item0.id", "item0.serial_number", "item0.sr_no")} == \
+        {"item0.id": "boq-1", "item0.serial_number": "1", "item0.sr_no": 1}
+    assert items[0]["billed_quantity"] == 8.0
+
+
+def test_billed_quantity_update_guards_remaining_quantity():
+    billing = billed_quantity_update([boq_item()], [{"boq_item_id": "boq-1", "quantity": 1.009}])
+    [match] = billing["filter"]["$and"]
+    guard = match["boq_items"]["$elemMatch"]["$or"]
+    assert guard[0]["billed_quantity"]["$lte"] == pytest.approx(8.9915)
+    assert guard[1] == {"billed_quantity": {"$exists": False}}
+    assert billing["array_filters"][0]["$or"][0]["item0.billed_quantity"]["$lte"] == pytest.approx(8.9915)
+
+
+def test_billed_quantity_update_without_billed_items():
+    assert billed_quantity_update([boq_item()], [{"boq_item_id": "other", "quantity": 1}]) is None
+    assert billed_quantity_update([boq_item(quantity=None)], [{"boq_item_id": "boq-1", "quantity": 1}]) is None
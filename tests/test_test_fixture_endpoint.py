@@ -0,0 +1,32 @@
+import pytest
+
+import server
+
+CREDENTIALS = {"email": "tester@example.com", "password": "secret"}
+
+
+@pytest.fixture
+def client(client, monkeypatch):
+    monkeypatch.setattr(server, "ENABLE_TEST_FIXTURES", True)
+    return client
+
+
+@pytest.mark.parametrize("payload", [
+    {"credentials": CREDENTIALS, "client": "not-an-object"},
+    {"credentials": CREDENTIALS, "project": ["not", "an", "object"]},
+    {"credentials": CREDENTIALS, "client": {}, "project": None},
+])
+def test_non_object_client_or_project_is_rejected(client, payload):
+    response = client.post("/api/test-fixture", json=payload)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "client and project must be objects"
+
+
+def test_bad_credentials_are_rejected(client):
+    response = client.post("/api/test-fixture", json={"credentials": {"email": "tester@example.com"}})
+    assert response.status_code == 400
+
+
+def test_disabled_by_default(client, monkeypatch):
+    monkeypatch.setattr(server, "ENABLE_TEST_FIXTURES", False)
+    assert client.post("/api/test-fixture", json={"credentials": CREDENTIALS}).status_code == 404
@@ -6,12 +6,76 @@ Tests the EXACT scenario the user reported in their screenshot:
 - This should now be COMPLETELY BLOCKED
 """
 
-import requests
+import asyncio
+import httpx
+import orjson
 import sys
 import json
+import os
+import time
 from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+
+SCENARIO_PROJECT_NAME = "User Exact Scenario Project"
+SCENARIO_CLIENT_NAME = "User Scenario Client"
+
+# Login tokens are reused across runs until shortly before they expire; set REAUTH=1 to force a login
+TOKEN_CACHE_PATH = Path.home() / ".cache" / "user_exact_scenario_token.json"
+TOKEN_CACHE_TTL = 3300
+
+# The scenario project is reused across runs, with its BOQ reset each time; set REBUILD_FIXTURE=1 to recreate it
+FIXTURE_CACHE_PATH = Path.home() / ".cache" / "user_exact_scenario_fixture.json"
+
+# Each edge case bills its own BOQ item with 1.009 remaining, since accepted invoices
+# now record their billed quantity on the project: (serial number, quantity, name, expectation)
+EDGE_CASES = [
+    ("E1", 1.009, "Exact limit", "Should be allowed"),
+    ("E2", 1.010, "Just over limit", "Should be blocked"),
+    ("E3", 1.008, "Just under limit", "Should be allowed"),
+    ("E4", 2.000, "Double the limit", "Should be blocked"),
+    ("E5", 0.500, "Half the limit", "Should be allowed"),
+]
+
+def scenario_boq_items():
+    """BOQ for the scenario project: item 1 plus one item per edge case, each with exactly 1.009 remaining"""
+    return [
+        {
+            "serial_number": "1",
+            "description": "Foundation Work",
+            "unit": "Cum",
+            "quantity": 10.0,  # Total quantity
+            "rate": 5000.0,
+            "amount": 50000.0,
+            "billed_quantity": 8.991,  # Already billed, leaving exactly 1.009 remaining
+            "gst_rate": 18.0
+        }
+    ] + [
+        {
+            "serial_number": serial,
+            "description": f"Foundation Work - {case_name}",
+            "unit": "Cum",
+            "quantity": 10.0,
+            "rate": 5000.0,
+            "amount": 50000.0,
+            "billed_quantity": 8.991,
+            "gst_rate": 18.0
+        }
+        for serial, _, case_name, _ in EDGE_CASES
+    ]
+
+# Only idempotent GETs are retried on gateway errors; the POSTs here expect 400s and mutate state
+RETRY_STATUSES = frozenset({502, 503, 504})
+GET_RETRIES = 3
+RETRY_BACKOFF = 0.2
+
+# Error responses shorter than this many bytes are returned as text without JSON parsing
+SMALL_ERROR_BODY = 256
 
 class UserExactScenarioTester:
+    # POST /projects echoes the saved project; set False to always re-read it with a GET
+    _PROJECT_POST_RETURNS_BODY = True
+
     def __init__(self):
         self.base_url = "https://template-maestro.preview.emergentagent.com"
         self.api_url = f"{self.base_url}/api"
@@ -20,80 +84,144 @@ class UserExactScenarioTester:
         self.tests_run = 0
         self.tests_passed = 0
         self.critical_failures = []
+        self._base_invoice = {}
+        
+        # Output is buffered and written once rather than per line
+        self._log_lines = []
+        
+        # One pooled HTTP/2 client multiplexes all calls, including concurrent ones, over one connection.
+        # The transport retries failed connection attempts only, which never re-send a request body.
+        transport = httpx.AsyncHTTPTransport(http2=True, retries=GET_RETRIES,
+                                             limits=httpx.Limits(max_keepalive_connections=8, max_connections=16))
+        self.client = httpx.AsyncClient(transport=transport, base_url=self.api_url,
+                                        timeout=httpx.Timeout(10.0, connect=5.0))
 
     def log_test(self, name, success, details="", is_critical=False):
         """Log test results with critical failure tracking"""
+        # Runs between awaits on the event loop, so concurrent subtests cannot interleave updates
         self.tests_run += 1
         if success:
             self.tests_passed += 1
-            print(f"✅ {name} - PASSED {details}")
+            self.log(f"✅ {name} - PASSED {details}")
         else:
-            print(f"❌ {name} - FAILED {details}")
+            self.log(f"❌ {name} - FAILED {details}")
             if is_critical:
                 self.critical_failures.append(f"{name}: {details}")
         return success
 
-    def make_request(self, method, endpoint, data=None, files=None, expected_status=200):
-        """Make HTTP request with proper headers"""
-        url = f"{self.api_url}/{endpoint}"
-        headers = {}
-        
-        if self.token:
-            headers['Authorization'] = f'Bearer {self.token}'
-        
-        if files is None and data is not None:
-            headers['Content-Type'] = 'application/json'
+    def log(self, line):
+        """Buffer an output line until flush_log"""
+        self._log_lines.append(line)
 
+    def flush_log(self):
+        """Write all buffered output lines to stdout in one call"""
+        lines, self._log_lines = self._log_lines, []
+        if lines:
+            sys.stdout.write("\n".join(lines) + "\n")
+            sys.stdout.flush()
+
+    async def make_request(self, method, endpoint, data=None):
+        """Make HTTP request and return (status_code, body); status_code is None if the request failed.
+        
+        The body is parsed once: JSON when the response has it, otherwise the raw text.
+        Callers that care about a specific outcome compare the returned status themselves.
+        """
         try:
-            if method == 'GET':
-                response = requests.get(url, headers=headers)
-            elif method == 'POST':
-                response = requests.post(url, headers=headers, json=data)
-            elif method == 'PUT':
-                response = requests.put(url, headers=headers, json=data)
+            if data is None:
+                response = await self.client.request(method, endpoint)
+                if method == 'GET':
+                    for attempt in range(GET_RETRIES):
+                        if response.status_code not in RETRY_STATUSES:
+                            break
+                        await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+                        response = await self.client.request(method, endpoint)
             else:
-                return False, f"Unsupported method: {method}"
+                response = await self.client.request(method, endpoint, content=orjson.dumps(data),
+                                                     headers={'Content-Type': 'application/json'})
+        except httpx.HTTPError as e:
+            return None, f"Request failed: {str(e)}"
 
-            success = response.status_code == expected_status
-            
-            if success:
-                try:
-                    return True, response.json()
-                except:
-                    return True, response.content
-            else:
-                try:
-                    error_detail = response.json().get('detail', 'Unknown error')
-                except:
-                    error_detail = response.text
-                return False, f"Status {response.status_code}: {error_detail}"
+        # Short error bodies are only ever logged, so skip decoding them. Chunked and HTTP/2
+        # responses may carry no Content-Length; their size is unknown, so they are parsed.
+        content_length = response.headers.get('content-length')
+        if (response.status_code >= 400 and content_length is not None and content_length.isdigit()
+                and int(content_length) < SMALL_ERROR_BODY):
+            return response.status_code, response.text
+
+        try:
+            body = orjson.loads(response.content)
+        except orjson.JSONDecodeError:
+            body = response.text
+        return response.status_code, body
+
+    def _created_invoice_id(self, result):
+        """Invoice id from a successful create response"""
+        return result.get('invoice_id', 'Unknown') if isinstance(result, dict) else 'Unknown'
 
-        except Exception as e:
-            return False, f"Request failed: {str(e)}"
+    def _load_cached_token(self):
+        """Return the cached login response if it has not expired"""
+        if os.environ.get('REAUTH') == '1':
+            return None
+        try:
+            cached = json.loads(TOKEN_CACHE_PATH.read_text())
+        except (OSError, ValueError):
+            return None
+        return cached if cached.get('exp', 0) > time.time() else None
+
+    def _save_cached_token(self):
+        """Persist the current token so later runs can skip the login round trip"""
+        try:
+            TOKEN_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+            # Owner-only from the moment the file exists; the token must never be readable by others
+            fd = os.open(TOKEN_CACHE_PATH, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as token_file:
+                # A file left by an older run may have been created with looser permissions
+                os.fchmod(token_file.fileno(), 0o600)
+                token_file.write(json.dumps({
+                    "token": self.token,
+                    "user": self.user_data,
+                    "exp": time.time() + TOKEN_CACHE_TTL
+                }))
+        except OSError:
+            pass
 
-    def authenticate(self):
+    async def authenticate(self):
         """Authenticate with the system"""
-        print("🔐 Authenticating with system...")
-        
-        success, result = self.make_request('POST', 'auth/login', 
+        self.log("🔐 Authenticating with system...")
+        
+        cached = self._load_cached_token()
+        if cached:
+            self.client.headers['Authorization'] = f'Bearer {cached["token"]}'
+            status, _ = await self.make_request('GET', 'auth/me')
+            if status == 200:
+                self.token = cached['token']
+                self.user_data = cached['user']
+                self.log_test("Authentication", True, f"- Reused cached token for {self.user_data['email']}")
+                return True
+            del self.client.headers['Authorization']
+        
+        status, result = await self.make_request('POST', 'auth/login', 
                                           {'email': 'brightboxm@gmail.com', 'password': 'admin123'})
         
-        if success and 'access_token' in result:
+        if status == 200 and 'access_token' in result:
             self.token = result['access_token']
+            # Set once so make_request never rebuilds per-call headers
+            self.client.headers['Authorization'] = f'Bearer {self.token}'
             self.user_data = result['user']
+            self._save_cached_token()
             self.log_test("Authentication", True, f"- Logged in as {self.user_data['email']}")
             return True
         else:
             self.log_test("Authentication", False, f"- {result}", is_critical=True)
             return False
 
-    def create_exact_scenario_project(self):
+    async def create_exact_scenario_project(self):
         """Create project with exact scenario: item with 1.009 remaining"""
-        print("\n🏗️ Creating project with EXACT user scenario...")
+        self.log("\n🏗️ Creating project with EXACT user scenario...")
         
         # Create client first
         client_data = {
-            "name": "User Scenario Client",
+            "name": SCENARIO_CLIENT_NAME,
             "gst_no": "29ABCDE1234F1Z5",
             "bill_to_address": "Test Address, Bangalore, Karnataka - 560001",
             "contact_person": "Test Person",
@@ -101,8 +229,8 @@ class UserExactScenarioTester:
             "email": "test@userscenario.com"
         }
         
-        success, result = self.make_request('POST', 'clients', client_data)
-        if not success or 'client_id' not in result:
+        status, result = await self.make_request('POST', 'clients', client_data)
+        if status != 200 or 'client_id' not in result:
             self.log_test("Create client", False, f"- {result}", is_critical=True)
             return None, None
         
@@ -111,66 +239,101 @@ class UserExactScenarioTester:
         
         # Create project with BOQ item having exactly 1.009 remaining
         project_data = {
-            "project_name": "User Exact Scenario Project",
+            "project_name": SCENARIO_PROJECT_NAME,
             "architect": "Test Architect",
             "client_id": client_id,
-            "client_name": "User Scenario Client",
+            "client_name": SCENARIO_CLIENT_NAME,
             "project_metadata": {
-                "project_name": "User Exact Scenario Project",
+                "project_name": SCENARIO_PROJECT_NAME,
                 "architect": "Test Architect",
-                "client": "User Scenario Client",
+                "client": SCENARIO_CLIENT_NAME,
                 "location": "Test Location"
             },
-            "boq_items": [
-                {
-                    "serial_number": "1",
-                    "description": "Foundation Work",
-                    "unit": "Cum",
-                    "quantity": 10.0,  # Total quantity
-                    "rate": 5000.0,
-                    "amount": 50000.0,
-                    "billed_quantity": 8.991,  # Already billed, leaving exactly 1.009 remaining
-                    "gst_rate": 18.0
-                }
-            ],
-            "total_project_value": 50000.0,
+            "boq_items": scenario_boq_items(),
+            "total_project_value": 50000.0 * (len(EDGE_CASES) + 1),
             "created_by": self.user_data['id'] if self.user_data else "test-user-id"
         }
         
-        success, result = self.make_request('POST', 'projects', project_data)
-        if not success or 'project_id' not in result:
+        status, result = await self.make_request('POST', 'projects', project_data)
+        if status != 200 or 'project_id' not in result:
             self.log_test("Create project", False, f"- {result}", is_critical=True)
             return None, None
         
         project_id = result['project_id']
         
-        # Verify the remaining quantity is exactly 1.009
-        success, project = self.make_request('GET', f'projects/{project_id}')
-        if success and project.get('boq_items'):
+        # Verify the remaining quantity is exactly 1.009, reading the create response when it has the BOQ.
+        # POST /projects nests the saved document under "project".
+        saved = result.get('project', result)
+        if self._PROJECT_POST_RETURNS_BODY and isinstance(saved, dict) and saved.get('boq_items'):
+            project = saved
+        else:
+            status, project = await self.make_request('GET', f'projects/{project_id}')
+            if status != 200:
+                project = {}
+        if project.get('boq_items'):
             item = project['boq_items'][0]
             total_qty = item.get('quantity', 0)
             billed_qty = item.get('billed_quantity', 0)
-            remaining = total_qty - billed_qty
+            remaining = Decimal(str(total_qty)) - Decimal(str(billed_qty))
             
             self.log_test("Create project with exact scenario", True, 
                         f"- Project ID: {project_id}")
-            self.log_test("Verify remaining quantity", abs(remaining - 1.009) < 0.001, 
+            self.log_test("Verify remaining quantity", remaining == Decimal("1.009"), 
                         f"- Total: {total_qty}, Billed: {billed_qty}, Remaining: {remaining}")
         
+        self._set_base_invoice(project_id, client_id)
+        self._save_cached_fixture(project_id, client_id)
         return project_id, client_id
 
-    def test_exact_user_scenario_regular_endpoint(self, project_id, client_id):
-        """Test EXACT user scenario on regular invoice endpoint"""
-        print("\n🚨 TESTING EXACT USER SCENARIO - Regular Invoice Endpoint")
-        print("   Scenario: Bill Qty 07.30 when Remaining is 1.009")
-        print("   REQUIREMENT: MUST BE BLOCKED!")
+    async def load_cached_scenario_project(self):
+        """Reuse the project from a previous run, resetting its BOQ to exactly 1.009 remaining per item.
         
-        invoice_data = {
+        The accepted edge cases bill their items on every run, so the BOQ is rewritten rather than checked.
+        """
+        if os.environ.get('REBUILD_FIXTURE') == '1':
+            return None, None
+        try:
+            cached = json.loads(FIXTURE_CACHE_PATH.read_text())
+            project_id, client_id = cached['project_id'], cached['client_id']
+        except (OSError, ValueError, KeyError):
+            return None, None
+        
+        status, _ = await self.make_request('PUT', f'projects/{project_id}', {"boq_items": scenario_boq_items()})
+        if status != 200:
+            return None, None
+        
+        self.log_test("Reuse cached scenario project", True,
+                    f"- Project ID: {project_id}, Remaining: 1.009")
+        self._set_base_invoice(project_id, client_id)
+        return project_id, client_id
+
+    def _save_cached_fixture(self, project_id, client_id):
+        """Remember the scenario project so later runs can skip creating it"""
+        try:
+            FIXTURE_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+            FIXTURE_CACHE_PATH.write_text(json.dumps({"project_id": project_id, "client_id": client_id}))
+        except OSError:
+            pass
+
+    def _set_base_invoice(self, project_id, client_id):
+        """Fields shared by every invoice the scenario tests submit"""
+        self._base_invoice = {
             "project_id": project_id,
-            "project_name": "User Exact Scenario Project",
+            "project_name": SCENARIO_PROJECT_NAME,
             "client_id": client_id,
-            "client_name": "User Scenario Client",
-            "invoice_type": "tax_invoice",
+            "client_name": SCENARIO_CLIENT_NAME,
+            "created_by": self.user_data['id'] if self.user_data else "test-user-id",
+            "invoice_type": "tax_invoice"
+        }
+
+    async def test_exact_user_scenario_regular_endpoint(self, project_id, client_id):
+        """Test EXACT user scenario on regular invoice endpoint"""
+        self.log("\n🚨 TESTING EXACT USER SCENARIO - Regular Invoice Endpoint")
+        self.log("   Scenario: Bill Qty 07.30 when Remaining is 1.009")
+        self.log("   REQUIREMENT: MUST BE BLOCKED!")
+        
+        invoice_data = {
+            **self._base_invoice,
             "items": [
                 {
                     "boq_item_id": "1",
@@ -188,39 +351,31 @@ class UserExactScenarioTester:
             "subtotal": 36500.0,
             "total_gst_amount": 6570.0,
             "total_amount": 43070.0,
-            "status": "draft",
-            "created_by": self.user_data['id'] if self.user_data else "test-user-id"
+            "status": "draft"
         }
         
         # This MUST be blocked (expect 400 error)
-        success, result = self.make_request('POST', 'invoices', invoice_data, expected_status=400)
+        status, result = await self.make_request('POST', 'invoices', invoice_data)
         
-        if success:
+        if status == 400:
             self.log_test("Regular Invoice - User Scenario BLOCKED", True, 
                         "- ✅ CORRECTLY BLOCKED: 7.30 > 1.009 rejected", is_critical=False)
+        elif status == 200:
+            # Invoice was allowed - CRITICAL FAILURE
+            invoice_id = self._created_invoice_id(result)
+            self.log_test("Regular Invoice - User Scenario BLOCKED", False, 
+                        f"- 🚨 CRITICAL FAILURE: Invoice {invoice_id} CREATED with 7.30 > 1.009!", is_critical=True)
         else:
-            # Check if it was allowed (200 status) - CRITICAL FAILURE
-            success_allowed, result_allowed = self.make_request('POST', 'invoices', invoice_data, expected_status=200)
-            if success_allowed:
-                invoice_id = result_allowed.get('invoice_id', 'Unknown')
-                self.log_test("Regular Invoice - User Scenario BLOCKED", False, 
-                            f"- 🚨 CRITICAL FAILURE: Invoice {invoice_id} CREATED with 7.30 > 1.009!", is_critical=True)
-            else:
-                self.log_test("Regular Invoice - User Scenario BLOCKED", False, 
-                            f"- Unexpected error: {result}", is_critical=True)
+            self.log_test("Regular Invoice - User Scenario BLOCKED", False, 
+                        f"- Unexpected error: Status {status}: {result}", is_critical=True)
 
-    def test_exact_user_scenario_enhanced_endpoint(self, project_id, client_id):
+    async def test_exact_user_scenario_enhanced_endpoint(self, project_id, client_id):
         """Test EXACT user scenario on enhanced invoice endpoint"""
-        print("\n🚨 TESTING EXACT USER SCENARIO - Enhanced Invoice Endpoint")
+        self.log("\n🚨 TESTING EXACT USER SCENARIO - Enhanced Invoice Endpoint")
         
         invoice_data = {
-            "project_id": project_id,
-            "project_name": "User Exact Scenario Project",
-            "client_id": client_id,
-            "client_name": "User Scenario Client",
-            "invoice_type": "tax_invoice",
+            **self._base_invoice,
             "invoice_gst_type": "CGST_SGST",
-            "created_by": self.user_data['id'] if self.user_data else "test-user-id",
             "invoice_items": [
                 {
                     "boq_item_id": "1",
@@ -237,25 +392,23 @@ class UserExactScenarioTester:
         }
         
         # This MUST be blocked (expect 400 error)
-        success, result = self.make_request('POST', 'invoices/enhanced', invoice_data, expected_status=400)
+        status, result = await self.make_request('POST', 'invoices/enhanced', invoice_data)
         
-        if success:
+        if status == 400:
             self.log_test("Enhanced Invoice - User Scenario BLOCKED", True, 
                         "- ✅ CORRECTLY BLOCKED: 7.30 > 1.009 rejected", is_critical=False)
+        elif status == 200:
+            # Invoice was allowed - CRITICAL FAILURE
+            invoice_id = self._created_invoice_id(result)
+            self.log_test("Enhanced Invoice - User Scenario BLOCKED", False, 
+                        f"- 🚨 CRITICAL FAILURE: Enhanced invoice {invoice_id} CREATED with 7.30 > 1.009!", is_critical=True)
         else:
-            # Check if it was allowed (200 status) - CRITICAL FAILURE
-            success_allowed, result_allowed = self.make_request('POST', 'invoices/enhanced', invoice_data, expected_status=200)
-            if success_allowed:
-                invoice_id = result_allowed.get('invoice_id', 'Unknown')
-                self.log_test("Enhanced Invoice - User Scenario BLOCKED", False, 
-                            f"- 🚨 CRITICAL FAILURE: Enhanced invoice {invoice_id} CREATED with 7.30 > 1.009!", is_critical=True)
-            else:
-                self.log_test("Enhanced Invoice - User Scenario BLOCKED", False, 
-                            f"- Unexpected error: {result}", is_critical=True)
+            self.log_test("Enhanced Invoice - User Scenario BLOCKED", False, 
+                        f"- Unexpected error: Status {status}: {result}", is_critical=True)
 
-    def test_validation_endpoint_user_scenario(self, project_id):
+    async def test_validation_endpoint_user_scenario(self, project_id):
         """Test validation endpoint with user scenario"""
-        print("\n🔍 TESTING Validation Endpoint - User Scenario")
+        self.log("\n🔍 TESTING Validation Endpoint - User Scenario")
         
         validation_data = {
             "project_id": project_id,
@@ -268,9 +421,9 @@ class UserExactScenarioTester:
             ]
         }
         
-        success, result = self.make_request('POST', 'invoices/validate-quantities', validation_data)
+        status, result = await self.make_request('POST', 'invoices/validate-quantities', validation_data)
         
-        if success:
+        if status == 200:
             is_valid = result.get('valid', True)
             errors = result.get('errors', [])
             warnings = result.get('warnings', [])
@@ -285,9 +438,9 @@ class UserExactScenarioTester:
             self.log_test("Validation Endpoint - User Scenario", False, 
                         f"- Validation failed: {result}", is_critical=True)
 
-    def test_description_matching_variations(self, project_id):
+    async def test_description_matching_variations(self, project_id):
         """Test different description variations that might cause matching issues"""
-        print("\n🔤 TESTING Description Matching Variations")
+        self.log("\n🔤 TESTING Description Matching Variations")
         
         test_cases = [
             ("Foundation Work", "Exact match"),
@@ -297,7 +450,7 @@ class UserExactScenarioTester:
             ("Foundation  Work", "Extra spaces"),
         ]
         
-        for description, case_name in test_cases:
+        async def validate(description):
             validation_data = {
                 "project_id": project_id,
                 "invoice_items": [
@@ -308,10 +461,14 @@ class UserExactScenarioTester:
                     }
                 ]
             }
-            
-            success, result = self.make_request('POST', 'invoices/validate-quantities', validation_data)
-            
-            if success:
+            return await self.make_request('POST', 'invoices/validate-quantities', validation_data)
+        
+        # The endpoint reports validity for the whole payload rather than per item, and every
+        # variation targets the same BOQ item, so send them as concurrent single-item requests
+        results = await asyncio.gather(*(validate(description) for description, _ in test_cases))
+        
+        for (description, case_name), (status, result) in zip(test_cases, results):
+            if status == 200:
                 is_valid = result.get('valid', True)
                 if not is_valid:
                     self.log_test(f"Description Match: {case_name}", True, 
@@ -323,102 +480,100 @@ class UserExactScenarioTester:
                 self.log_test(f"Description Match: {case_name}", False, 
                             f"- Validation failed for '{description}': {result}")
 
-    def test_edge_cases_around_limit(self, project_id, client_id):
+    async def test_edge_cases_around_limit(self, project_id, client_id):
         """Test edge cases around the 1.009 limit"""
-        print("\n⚖️ TESTING Edge Cases Around 1.009 Limit")
-        
-        edge_cases = [
-            (1.009, "Exact limit", "Should be allowed"),
-            (1.010, "Just over limit", "Should be blocked"),
-            (1.008, "Just under limit", "Should be allowed"),
-            (2.000, "Double the limit", "Should be blocked"),
-            (0.500, "Half the limit", "Should be allowed"),
-        ]
+        self.log("\n⚖️ TESTING Edge Cases Around 1.009 Limit")
         
-        for quantity, case_name, expectation in edge_cases:
-            print(f"\n   Testing: {case_name} (Qty: {quantity}) - {expectation}")
-            
-            invoice_data = {
-                "project_id": project_id,
-                "project_name": "User Exact Scenario Project",
-                "client_id": client_id,
-                "client_name": "User Scenario Client",
-                "invoice_type": "proforma",  # Use proforma to avoid RA complications
-                "items": [
-                    {
-                        "boq_item_id": "1",
-                        "serial_number": "1",
-                        "description": f"Foundation Work - Edge Case {quantity}",
-                        "unit": "Cum",
-                        "quantity": quantity,
-                        "rate": 5000.0,
-                        "amount": quantity * 5000.0,
-                        "gst_rate": 18.0,
-                        "gst_amount": quantity * 5000.0 * 0.18,
-                        "total_with_gst": quantity * 5000.0 * 1.18
-                    }
-                ],
-                "subtotal": quantity * 5000.0,
-                "total_gst_amount": quantity * 5000.0 * 0.18,
-                "total_amount": quantity * 5000.0 * 1.18,
-                "status": "draft",
-                "created_by": self.user_data['id'] if self.user_data else "test-user-id"
-            }
+        # Accepted invoices rewrite the project's BOQ, so concurrent posts would conflict; send them in order
+        for serial, quantity, case_name, expectation in EDGE_CASES:
+            self.log(f"\n   Testing: {case_name} (Qty: {quantity}) - {expectation}")
             
             should_be_blocked = quantity > 1.009
-            expected_status = 400 if should_be_blocked else 200
-            
-            success, result = self.make_request('POST', 'invoices', invoice_data, expected_status=expected_status)
+            invoice_data = self._build_edge_invoice(serial, quantity)
+            status, result = await self.make_request('POST', 'invoices', invoice_data)
             
-            if success:
-                if should_be_blocked:
-                    self.log_test(f"Edge Case: {case_name}", True, 
-                                f"- ✅ Correctly blocked quantity {quantity}")
-                else:
-                    invoice_id = result.get('invoice_id', 'Unknown')
-                    self.log_test(f"Edge Case: {case_name}", True, 
-                                f"- ✅ Correctly allowed quantity {quantity}, Invoice: {invoice_id}")
+            if status == 400 and should_be_blocked:
+                self.log_test(f"Edge Case: {case_name}", True, 
+                            f"- ✅ Correctly blocked quantity {quantity}")
+            elif status == 200 and not should_be_blocked:
+                invoice_id = self._created_invoice_id(result)
+                self.log_test(f"Edge Case: {case_name}", True, 
+                            f"- ✅ Correctly allowed quantity {quantity}, Invoice: {invoice_id}")
+            elif status == 200:
+                self.log_test(f"Edge Case: {case_name}", False, 
+                            f"- 🚨 Should be blocked but was allowed: {quantity}", is_critical=True)
+            elif status == 400:
+                self.log_test(f"Edge Case: {case_name}", False, 
+                            f"- Should be allowed but was blocked: {quantity}")
             else:
-                if should_be_blocked:
-                    # Check if it was unexpectedly allowed
-                    success_allowed, result_allowed = self.make_request('POST', 'invoices', invoice_data, expected_status=200)
-                    if success_allowed:
-                        self.log_test(f"Edge Case: {case_name}", False, 
-                                    f"- 🚨 Should be blocked but was allowed: {quantity}", is_critical=True)
-                    else:
-                        self.log_test(f"Edge Case: {case_name}", False, 
-                                    f"- Unexpected error: {result}")
-                else:
-                    self.log_test(f"Edge Case: {case_name}", False, 
-                                f"- Should be allowed but was blocked: {quantity}")
+                self.log_test(f"Edge Case: {case_name}", False, 
+                            f"- Unexpected error: Status {status}: {result}")
 
-    def run_user_exact_scenario_tests(self):
+    def _build_edge_invoice(self, serial, quantity):
+        """Build a single-item tax invoice body billing an edge-case quantity against one BOQ item"""
+        amount = quantity * 5000.0
+        gst = amount * 0.18
+        total = amount + gst
+        return {
+            **self._base_invoice,
+            "items": [
+                {
+                    "boq_item_id": serial,
+                    "serial_number": serial,
+                    "description": f"Foundation Work - Edge Case {quantity}",
+                    "unit": "Cum",
+                    "quantity": quantity,
+                    "rate": 5000.0,
+                    "amount": amount,
+                    "gst_rate": 18.0,
+                    "gst_amount": gst,
+                    "total_with_gst": total
+                }
+            ],
+            "subtotal": amount,
+            "total_gst_amount": gst,
+            "total_amount": total,
+            "status": "draft"
+        }
+
+    async def run_user_exact_scenario_tests(self):
         """Run all tests for user's exact scenario"""
-        print("🚨 USER'S EXACT SCENARIO TEST - FINAL VALIDATION")
-        print("=" * 80)
-        print("CRITICAL REQUIREMENT: Bill Qty 07.30 when Remaining is 1.009 MUST BE BLOCKED!")
-        print("User reported this was previously accepted - testing if now blocked.")
-        print("=" * 80)
+        try:
+            return await self._run_scenario()
+        finally:
+            self.flush_log()
+            await self.client.aclose()
+
+    async def _run_scenario(self):
+        self.log("🚨 USER'S EXACT SCENARIO TEST - FINAL VALIDATION")
+        self.log("=" * 80)
+        self.log("CRITICAL REQUIREMENT: Bill Qty 07.30 when Remaining is 1.009 MUST BE BLOCKED!")
+        self.log("User reported this was previously accepted - testing if now blocked.")
+        self.log("=" * 80)
         
         # Step 1: Authenticate
-        if not self.authenticate():
-            print("\n❌ CRITICAL FAILURE: Cannot authenticate")
+        if not await self.authenticate():
+            self.log("\n❌ CRITICAL FAILURE: Cannot authenticate")
             return False
         
-        # Step 2: Create exact scenario
-        project_id, client_id = self.create_exact_scenario_project()
+        # Step 2: Reuse or create exact scenario
+        project_id, client_id = await self.load_cached_scenario_project()
+        if not project_id:
+            project_id, client_id = await self.create_exact_scenario_project()
         if not project_id or not client_id:
-            print("\n❌ CRITICAL FAILURE: Cannot create test scenario")
+            self.log("\n❌ CRITICAL FAILURE: Cannot create test scenario")
             return False
         
-        # Step 3: Test exact user scenario
-        self.test_exact_user_scenario_regular_endpoint(project_id, client_id)
-        self.test_exact_user_scenario_enhanced_endpoint(project_id, client_id)
-        self.test_validation_endpoint_user_scenario(project_id)
+        # Step 3: Test exact user scenario (independent once the project exists)
+        await asyncio.gather(
+            self.test_exact_user_scenario_regular_endpoint(project_id, client_id),
+            self.test_exact_user_scenario_enhanced_endpoint(project_id, client_id),
+            self.test_validation_endpoint_user_scenario(project_id)
+        )
         
         # Step 4: Test variations and edge cases
-        self.test_description_matching_variations(project_id)
-        self.test_edge_cases_around_limit(project_id, client_id)
+        await self.test_description_matching_variations(project_id)
+        await self.test_edge_cases_around_limit(project_id, client_id)
         
         # Step 5: Report results
         self.report_final_results()
@@ -427,34 +582,35 @@ class UserExactScenarioTester:
 
     def report_final_results(self):
         """Report final test results"""
-        print("\n" + "=" * 80)
-        print("🚨 USER'S EXACT SCENARIO TEST RESULTS")
-        print("=" * 80)
+        self.log("\n" + "=" * 80)
+        self.log("🚨 USER'S EXACT SCENARIO TEST RESULTS")
+        self.log("=" * 80)
         
         success_rate = (self.tests_passed / self.tests_run * 100) if self.tests_run > 0 else 0
         
-        print(f"📊 OVERALL RESULTS:")
-        print(f"   Tests Run: {self.tests_run}")
-        print(f"   Tests Passed: {self.tests_passed}")
-        print(f"   Success Rate: {success_rate:.1f}%")
+        self.log(f"📊 OVERALL RESULTS:")
+        self.log(f"   Tests Run: {self.tests_run}")
+        self.log(f"   Tests Passed: {self.tests_passed}")
+        self.log(f"   Success Rate: {success_rate:.1f}%")
         
         if self.critical_failures:
-            print(f"\n🚨 CRITICAL FAILURES ({len(self.critical_failures)}):")
+            self.log(f"\n🚨 CRITICAL FAILURES ({len(self.critical_failures)}):")
             for i, failure in enumerate(self.critical_failures, 1):
-                print(f"   {i}. {failure}")
+                self.log(f"   {i}. {failure}")
             
-            print(f"\n❌ FINAL RESULT: USER'S ISSUE NOT FULLY RESOLVED!")
-            print(f"   The exact scenario (Bill Qty 7.30 vs Remaining 1.009) may still be vulnerable.")
-            print(f"   IMMEDIATE MAIN AGENT ACTION REQUIRED!")
+            self.log(f"\n❌ FINAL RESULT: USER'S ISSUE NOT FULLY RESOLVED!")
+            self.log(f"   The exact scenario (Bill Qty 7.30 vs Remaining 1.009) may still be vulnerable.")
+            self.log(f"   IMMEDIATE MAIN AGENT ACTION REQUIRED!")
         else:
-            print(f"\n✅ FINAL RESULT: USER'S EXACT SCENARIO COMPLETELY RESOLVED!")
-            print(f"   Bill Qty 7.30 vs Remaining 1.009 is now properly blocked.")
-            print(f"   All quantity validation security measures are working correctly.")
-            print(f"   User's critical business logic failure has been fixed.")
+            self.log(f"\n✅ FINAL RESULT: USER'S EXACT SCENARIO COMPLETELY RESOLVED!")
+            self.log(f"   Bill Qty 7.30 vs Remaining 1.009 is now properly blocked.")
+            self.log(f"   All quantity validation security measures are working correctly.")
+            self.log(f"   User's critical business logic failure has been fixed.")
         
-        print("=" * 80)
+        self.log("=" * 80)
+        self.flush_log()
 
 if __name__ == "__main__":
     tester = UserExactScenarioTester()
-    success = tester.run_user_exact_scenario_tests()
+    success = asyncio.run(tester.run_user_exact_scenario_tests())
     sys.exit(0 if success else 1)
\ No newline at end of file
@@ -4,18 +4,94 @@
 Tests all the critical fixes implemented to resolve user's specific feedback
 """
 
-import requests
+import asyncio
+import httpx
+import ijson
 import sys
 import json
+import orjson
+import time
 from datetime import datetime
 
+# Gateway errors worth retrying; only idempotent methods are retried on them
+RETRY_STATUSES = frozenset({502, 503, 504})
+MAX_RETRIES = 2
+RETRY_BACKOFF = 0.2
+
+JSON_HEADERS = {'Content-Type': 'application/json'}
+
+# Test categories allowed in flight at once
+MAX_CONCURRENT_TESTS = 4
+
+# Successful GET responses are reused for this many seconds
+GET_CACHE_TTL = 5.0
+
+TEST_CREDENTIALS = {'email': 'brightboxm@gmail.com', 'password': 'admin123'}
+
+TEST_CLIENT = {
+    "name": "Test Client for User Issues",
+    "gst_no": "29ABCDE1234F1Z5",
+    "bill_to_address": "123 Test Street, Bangalore, Karnataka - 560001",
+    "contact_person": "John Doe",
+    "phone": "+91-9876543210",
+    "email": "john@testclient.com"
+}
+
+# Test project with BOQ items; client_id and created_by are filled in at setup
+TEST_PROJECT = {
+    "project_name": "User Issues Test Project",
+    "architect": "Test Architect",
+    "client_name": "Test Client for User Issues",
+    "boq_items": [
+        {
+            "serial_number": "1",
+            "description": "Foundation Work",
+            "unit": "Cum",
+            "quantity": 100.0,
+            "rate": 5000.0,
+            "amount": 500000.0,
+            "billed_quantity": 95.0,  # Already billed 95, remaining 5
+            "gst_rate": 18.0
+        },
+        {
+            "serial_number": "2", 
+            "description": "Steel Structure Work",
+            "unit": "Kg",
+            "quantity": 50.0,
+            "rate": 350.0,
+            "amount": 17500.0,
+            "billed_quantity": 48.991,  # Already billed 48.991, remaining 1.009
+            "gst_rate": 18.0
+        }
+    ],
+    "total_project_value": 517500.0
+}
+
 class UserIssuesFinalTester:
     def __init__(self):
         # Use the correct backend URL from frontend/.env
         self.base_url = "https://template-maestro.preview.emergentagent.com"
         self.api_url = f"{self.base_url}/api"
+        # One pooled client so every request reuses the same keep-alive connection;
+        # the transport retries failed connection attempts, which never re-send a body
+        # HTTP/2 multiplexes the concurrent invoice POSTs over that one connection
+        # (falling back to HTTP/1.1 keep-alive if the server does not negotiate it)
+        transport = httpx.AsyncHTTPTransport(http2=True, retries=MAX_RETRIES,
+                                             limits=httpx.Limits(max_connections=16, max_keepalive_connections=4))
+        self.client = httpx.AsyncClient(transport=transport, base_url=self.api_url, timeout=10)
         self.token = None
         self.user_data = None
+        self.project_id = None
+        self.client_id = None
+        self._batch_supported = None
+        self._capabilities = {}
+        self._invoice_template = None
+        self._item_template = None
+        self._steel_item_template = None
+        # (endpoint, token) -> (fetched_at, body) for successful GETs
+        self._cache = {}
+        # Cached GETs under these prefixes go stale whenever an invoice is written
+        self._invalidate_prefixes = {'projects'}
         self.tests_run = 0
         self.tests_passed = 0
         self.created_resources = {
@@ -23,6 +99,7 @@ class UserIssuesFinalTester:
             'projects': [],
             'invoices': []
         }
+        self._build_request_closures()
 
     def log_test(self, name, success, details=""):
         """Log test results"""
@@ -34,262 +111,299 @@ class UserIssuesFinalTester:
             print(f"❌ {name} - FAILED {details}")
         return success
 
-    def make_request(self, method, endpoint, data=None, files=None, expected_status=200):
-        """Make HTTP request with proper headers"""
-        url = f"{self.api_url}/{endpoint}"
-        headers = {}
-        
-        if self.token:
-            headers['Authorization'] = f'Bearer {self.token}'
-        
-        if files is None and data is not None:
-            headers['Content-Type'] = 'application/json'
+    def _build_request_closures(self):
+        """Bind one coroutine per request shape (_get, _post_json, _put_json, _delete).
+        
+        Each returns (status_code, body); status_code is None if the request failed. The body
+        is the parsed JSON when the response has it, otherwise the raw text. Callers compare
+        the returned status themselves, so every case needs exactly one request.
+        """
+        request = self.client.request
+        cache = self._cache
 
-        try:
-            if method == 'GET':
-                response = requests.get(url, headers=headers)
-            elif method == 'POST':
-                if files:
-                    response = requests.post(url, headers={k: v for k, v in headers.items() if k != 'Content-Type'}, 
-                                           data=data, files=files)
-                else:
-                    response = requests.post(url, headers=headers, json=data)
-            elif method == 'PUT':
-                response = requests.put(url, headers=headers, json=data)
-            elif method == 'DELETE':
-                response = requests.delete(url, headers=headers)
-            else:
-                return False, f"Unsupported method: {method}"
+        def decode(response):
+            # Decode straight from bytes; orjson.JSONDecodeError is a ValueError
+            try:
+                return response.status_code, orjson.loads(response.content)
+            except ValueError:
+                return response.status_code, response.text
 
-            success = response.status_code == expected_status
-            
-            if success:
-                try:
-                    return True, response.json()
-                except:
-                    return True, response.content
-            else:
-                try:
-                    error_detail = response.json().get('detail', 'Unknown error')
-                except:
-                    error_detail = response.text
-                return False, f"Status {response.status_code}: {error_detail}"
+        async def retry_gateway_errors(response, method, endpoint, **kwargs):
+            # Only idempotent methods are re-issued; POSTs keep their first answer
+            for attempt in range(MAX_RETRIES):
+                if response.status_code not in RETRY_STATUSES:
+                    break
+                await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+                response = await request(method, endpoint, **kwargs)
+            return response
+
+        def invalidate_after_write(endpoint):
+            if endpoint.startswith('invoices'):
+                stale = tuple(self._invalidate_prefixes)
+                for key in [key for key in cache if key[0].startswith(stale)]:
+                    del cache[key]
+
+        async def _get(endpoint):
+            key = (endpoint, self.token)
+            cached = cache.get(key)
+            if cached and time.monotonic() - cached[0] < GET_CACHE_TTL:
+                return 200, cached[1]
+            try:
+                response = await retry_gateway_errors(await request('GET', endpoint), 'GET', endpoint)
+            except httpx.HTTPError as e:
+                return None, f"Request failed: {str(e)}"
+            status, body = decode(response)
+            if status == 200:
+                cache[key] = (time.monotonic(), body)
+            return status, body
 
-        except Exception as e:
-            return False, f"Request failed: {str(e)}"
+        async def _post_json(endpoint, payload):
+            try:
+                response = await request('POST', endpoint, content=orjson.dumps(payload), headers=JSON_HEADERS)
+            except httpx.HTTPError as e:
+                return None, f"Request failed: {str(e)}"
+            invalidate_after_write(endpoint)
+            return decode(response)
 
-    def authenticate(self):
+        async def _put_json(endpoint, payload):
+            content = orjson.dumps(payload)
+            try:
+                response = await request('PUT', endpoint, content=content, headers=JSON_HEADERS)
+                response = await retry_gateway_errors(response, 'PUT', endpoint,
+                                                      content=content, headers=JSON_HEADERS)
+            except httpx.HTTPError as e:
+                return None, f"Request failed: {str(e)}"
+            invalidate_after_write(endpoint)
+            return decode(response)
+
+        async def _delete(endpoint):
+            try:
+                response = await retry_gateway_errors(await request('DELETE', endpoint), 'DELETE', endpoint)
+            except httpx.HTTPError as e:
+                return None, f"Request failed: {str(e)}"
+            invalidate_after_write(endpoint)
+            return decode(response)
+
+        self._get = _get
+        self._post_json = _post_json
+        self._put_json = _put_json
+        self._delete = _delete
+
+    async def make_request(self, method, endpoint, data=None):
+        """Dispatch a (method, endpoint, data) triple to the matching request closure"""
+        if method == 'GET':
+            return await self._get(endpoint)
+        if method == 'POST':
+            return await self._post_json(endpoint, data)
+        if method == 'PUT':
+            return await self._put_json(endpoint, data)
+        if method == 'DELETE':
+            return await self._delete(endpoint)
+        return None, f"Unsupported method: {method}"
+
+    async def count_streamed_items(self, endpoint, prefix, predicate):
+        """GET endpoint and count the JSON items under prefix that satisfy predicate.
+        
+        The body is parsed incrementally as chunks arrive, so the full response is never
+        held in memory. Returns (status_code, count), or (status_code, body text) on error.
+        """
+        try:
+            async with self.client.stream('GET', endpoint) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    return response.status_code, response.text
+                
+                items = ijson.sendable_list()
+                parser = ijson.items_coro(items, prefix, use_float=True)
+                count = 0
+                async for chunk in response.aiter_bytes():
+                    parser.send(chunk)
+                    count += sum(1 for item in items if predicate(item))
+                    del items[:]
+                parser.close()
+                count += sum(1 for item in items if predicate(item))
+                return response.status_code, count
+        except (httpx.HTTPError, ijson.JSONError) as e:
+            return None, f"Request failed: {str(e)}"
+
+    async def batch_request(self, ops):
+        """Send (method, endpoint, data) ops as one POST /batch and return a (status, body) per op.
+        
+        Falls back to issuing the ops concurrently when the server has no batch endpoint;
+        that answer is remembered so later batches skip the probe.
+        """
+        if self._batch_supported is not False:
+            envelope = {'requests': [{'method': method, 'path': endpoint, 'body': data}
+                                for method, endpoint, data in ops]}
+            status, result = await self._post_json('batch', envelope)
+            if status == 200 and isinstance(result, dict) and len(result.get('results', [])) == len(ops):
+                self._batch_supported = True
+                return [(op.get('status'), op.get('body')) for op in result['results']]
+            if status in (404, 405):
+                self._batch_supported = False
+        
+        return await asyncio.gather(*(self.make_request(method, endpoint, data)
+                                      for method, endpoint, data in ops))
+
+    async def authenticate(self):
         """Authenticate with provided credentials"""
         print("🔐 Authenticating with provided credentials...")
         
-        success, result = self.make_request('POST', 'auth/login', 
-                                          {'email': 'brightboxm@gmail.com', 'password': 'admin123'})
+        status, result = await self._post_json('auth/login', TEST_CREDENTIALS)
         
-        if success and 'access_token' in result:
+        if status == 200 and 'access_token' in result:
             self.token = result['access_token']
             self.user_data = result['user']
+            self.client.headers['Authorization'] = f'Bearer {self.token}'
             self.log_test("Authentication", True, f"- Role: {self.user_data['role']}")
             return True
         else:
-            self.log_test("Authentication", False, f"- {result}")
+            self.log_test("Authentication", False, f"- Status {status}: {result}")
+            return False
+
+    async def load_test_fixture(self):
+        """Log in and create the client and project with one POST /test-fixture.
+        
+        Returns False without recording a test result when the server does not serve the
+        endpoint (it is disabled in production), so the caller can fall back to
+        authenticate() + setup_test_data().
+        """
+        print("🔐 Creating test fixture (login + client + project)...")
+        
+        status, result = await self._post_json('test-fixture', {
+            'credentials': TEST_CREDENTIALS,
+            'client': TEST_CLIENT,
+            'project': TEST_PROJECT
+        })
+        if status != 200 or 'access_token' not in result:
+            print(f"  ↪ Fixture endpoint unavailable (status {status}), using separate setup calls")
             return False
+        
+        self.token = result['access_token']
+        self.user_data = result['user']
+        self.client.headers['Authorization'] = f'Bearer {self.token}'
+        self.created_resources['clients'].append(result['client_id'])
+        self.created_resources['projects'].append(result['project_id'])
+        self.log_test("Authentication", True, f"- Role: {self.user_data['role']}")
+        self.log_test("Create test client", True, f"- Client ID: {result['client_id']}")
+        self.log_test("Create test project", True, f"- Project ID: {result['project_id']}")
+        self._set_fixture(result['project_id'], result['client_id'])
+        return True
+
+    def _set_fixture(self, project_id, client_id):
+        """Remember the fixture ids and build the invoice fields and BOQ line fields every test invoice shares"""
+        self.project_id = project_id
+        self.client_id = client_id
+        self._invoice_template = {
+            "project_id": project_id,
+            "project_name": TEST_PROJECT["project_name"],
+            "client_id": client_id,
+            "client_name": TEST_PROJECT["client_name"],
+            "invoice_type": "tax_invoice",
+            "created_by": self.user_data['id']
+        }
+        # BOQ item 1 (Foundation Work) and item 2 (Steel Structure Work)
+        self._item_template = {"boq_item_id": "1", "serial_number": "1", "unit": "Cum",
+                               "rate": 5000.0, "gst_rate": 18.0}
+        self._steel_item_template = {**self._item_template, "boq_item_id": "2", "serial_number": "2",
+                                     "unit": "Kg", "rate": 350.0}
 
-    def setup_test_data(self):
+    async def setup_test_data(self):
         """Create test client and project for testing"""
         print("\n📋 Setting up test data...")
         
         # Create test client
-        client_data = {
-            "name": "Test Client for User Issues",
-            "gst_no": "29ABCDE1234F1Z5",
-            "bill_to_address": "123 Test Street, Bangalore, Karnataka - 560001",
-            "contact_person": "John Doe",
-            "phone": "+91-9876543210",
-            "email": "john@testclient.com"
-        }
-        
-        success, result = self.make_request('POST', 'clients', client_data)
-        if success and 'client_id' in result:
+        status, result = await self._post_json('clients', TEST_CLIENT)
+        if status == 200 and 'client_id' in result:
             client_id = result['client_id']
             self.created_resources['clients'].append(client_id)
             self.log_test("Create test client", True, f"- Client ID: {client_id}")
         else:
-            self.log_test("Create test client", False, f"- {result}")
+            self.log_test("Create test client", False, f"- Status {status}: {result}")
             return False
         
         # Create test project with BOQ items
-        project_data = {
-            "project_name": "User Issues Test Project",
-            "architect": "Test Architect",
-            "client_id": client_id,
-            "client_name": "Test Client for User Issues",
-            "created_by": self.user_data['id'],
-            "boq_items": [
-                {
-                    "serial_number": "1",
-                    "description": "Foundation Work",
-                    "unit": "Cum",
-                    "quantity": 100.0,
-                    "rate": 5000.0,
-                    "amount": 500000.0,
-                    "billed_quantity": 95.0,  # Already billed 95, remaining 5
-                    "gst_rate": 18.0
-                },
-                {
-                    "serial_number": "2", 
-                    "description": "Steel Structure Work",
-                    "unit": "Kg",
-                    "quantity": 50.0,
-                    "rate": 350.0,
-                    "amount": 17500.0,
-                    "billed_quantity": 48.991,  # Already billed 48.991, remaining 1.009
-                    "gst_rate": 18.0
-                }
-            ],
-            "total_project_value": 517500.0
-        }
+        project_data = {**TEST_PROJECT, "client_id": client_id, "created_by": self.user_data['id']}
         
-        success, result = self.make_request('POST', 'projects', project_data)
-        if success and 'project_id' in result:
+        status, result = await self._post_json('projects', project_data)
+        if status == 200 and 'project_id' in result:
             project_id = result['project_id']
             self.created_resources['projects'].append(project_id)
             self.log_test("Create test project", True, f"- Project ID: {project_id}")
+            self._set_fixture(project_id, client_id)
             return True
         else:
-            self.log_test("Create test project", False, f"- {result}")
+            self.log_test("Create test project", False, f"- Status {status}: {result}")
             return False
 
-    def test_input_validation_auto_correction(self):
+    async def test_input_validation_auto_correction(self):
         """Test A: Input Validation Tests - Auto-correction to max allowed quantity"""
         print("\n🎯 Testing A: Input Validation Auto-Correction...")
         
-        if not self.created_resources['projects']:
-            self.log_test("Input validation setup", False, "- No test project available")
-            return False
-        
-        project_id = self.created_resources['projects'][0]
-        client_id = self.created_resources['clients'][0]
-        
         # Test Case 1: Try entering quantity 10.00 when balance is 5.00 - should auto-correct to 5.00
-        print("  📝 Test Case 1: Quantity 10.00 when balance is 5.00")
+        over_quantity_invoice = {**self._invoice_template, "items": [
+            {**self._item_template, "description": "Foundation Work - Over Quantity Test",
+             "quantity": 10.0, "amount": 50000.0}  # Requesting 10.0 when only 5.0 available
+        ]}
         
-        over_quantity_invoice = {
-            "project_id": project_id,
-            "project_name": "User Issues Test Project",
-            "client_id": client_id,
-            "client_name": "Test Client for User Issues",
-            "invoice_type": "tax_invoice",
-            "created_by": self.user_data['id'],
-            "items": [
-                {
-                    "boq_item_id": "1",
-                    "serial_number": "1",
-                    "description": "Foundation Work - Over Quantity Test",
-                    "unit": "Cum",
-                    "quantity": 10.0,  # Requesting 10.0 when only 5.0 available
-                    "rate": 5000.0,
-                    "amount": 50000.0,
-                    "gst_rate": 18.0
-                }
-            ]
-        }
+        # Test Case 2: Try entering quantity 7.30 when balance is 1.009 - should auto-correct to 1.009
+        user_exact_scenario = {**self._invoice_template, "items": [
+            {**self._steel_item_template, "description": "Steel Structure Work - User Scenario",
+             "quantity": 7.30, "amount": 2555.0}  # User's exact scenario: 7.30 when 1.009 remaining
+        ]}
+        
+        # Test Case 3: Valid quantity should work (within balance)
+        valid_quantity_invoice = {**self._invoice_template, "items": [
+            {**self._steel_item_template, "description": "Steel Structure Work - Valid Quantity",
+             "quantity": 1.0, "amount": 350.0}  # Valid quantity within remaining balance
+        ]}
+        
+        # The three cases are independent, so submit them together
+        over_result, scenario_result, valid_result = await asyncio.gather(
+            self._post_json('invoices', over_quantity_invoice),
+            self._post_json('invoices', user_exact_scenario),
+            self._post_json('invoices', valid_quantity_invoice)
+        )
         
+        print("  📝 Test Case 1: Quantity 10.00 when balance is 5.00")
         # Test regular invoice endpoint (should block over-quantity)
-        success, result = self.make_request('POST', 'invoices', over_quantity_invoice, expected_status=400)
-        if success:
+        status, result = over_result
+        if status == 400:
             self.log_test("Regular invoice blocks over-quantity (10.0 > 5.0)", True, "- Correctly blocked over-quantity invoice")
+        elif status == 200:
+            self.log_test("Regular invoice blocks over-quantity (10.0 > 5.0)", False, "- CRITICAL: Over-quantity invoice was created!")
         else:
-            # Check if it was created (which would be a failure)
-            success_created, created_result = self.make_request('POST', 'invoices', over_quantity_invoice)
-            if success_created:
-                self.log_test("Regular invoice blocks over-quantity (10.0 > 5.0)", False, "- CRITICAL: Over-quantity invoice was created!")
-            else:
-                self.log_test("Regular invoice blocks over-quantity (10.0 > 5.0)", True, "- Over-quantity blocked")
+            self.log_test("Regular invoice blocks over-quantity (10.0 > 5.0)", False, f"- Unexpected status {status}: {result}")
         
-        # Test Case 2: Try entering quantity 7.30 when balance is 1.009 - should auto-correct to 1.009
         print("  📝 Test Case 2: User's exact scenario - Quantity 7.30 when balance is 1.009")
-        
-        user_exact_scenario = {
-            "project_id": project_id,
-            "project_name": "User Issues Test Project", 
-            "client_id": client_id,
-            "client_name": "Test Client for User Issues",
-            "invoice_type": "tax_invoice",
-            "created_by": self.user_data['id'],
-            "items": [
-                {
-                    "boq_item_id": "2",
-                    "serial_number": "2",
-                    "description": "Steel Structure Work - User Scenario",
-                    "unit": "Kg",
-                    "quantity": 7.30,  # User's exact scenario: 7.30 when 1.009 remaining
-                    "rate": 350.0,
-                    "amount": 2555.0,
-                    "gst_rate": 18.0
-                }
-            ]
-        }
-        
         # Test regular invoice endpoint with user's exact scenario
-        success, result = self.make_request('POST', 'invoices', user_exact_scenario, expected_status=400)
-        if success:
+        status, result = scenario_result
+        if status == 400:
             self.log_test("User's exact scenario blocked (7.30 > 1.009)", True, "- User's critical issue resolved!")
+        elif status == 200:
+            self.log_test("User's exact scenario blocked (7.30 > 1.009)", False, "- CRITICAL: User's issue NOT resolved!")
         else:
-            # Check if it was created (which would be a failure)
-            success_created, created_result = self.make_request('POST', 'invoices', user_exact_scenario)
-            if success_created:
-                self.log_test("User's exact scenario blocked (7.30 > 1.009)", False, "- CRITICAL: User's issue NOT resolved!")
-            else:
-                self.log_test("User's exact scenario blocked (7.30 > 1.009)", True, "- User's issue resolved")
+            self.log_test("User's exact scenario blocked (7.30 > 1.009)", False, f"- Unexpected status {status}: {result}")
         
-        # Test Case 3: Valid quantity should work (within balance)
         print("  📝 Test Case 3: Valid quantity within balance")
-        
-        valid_quantity_invoice = {
-            "project_id": project_id,
-            "project_name": "User Issues Test Project",
-            "client_id": client_id, 
-            "client_name": "Test Client for User Issues",
-            "invoice_type": "tax_invoice",
-            "created_by": self.user_data['id'],
-            "items": [
-                {
-                    "boq_item_id": "2",
-                    "serial_number": "2",
-                    "description": "Steel Structure Work - Valid Quantity",
-                    "unit": "Kg",
-                    "quantity": 1.0,  # Valid quantity within remaining balance
-                    "rate": 350.0,
-                    "amount": 350.0,
-                    "gst_rate": 18.0
-                }
-            ]
-        }
-        
-        success, result = self.make_request('POST', 'invoices', valid_quantity_invoice)
-        if success and 'invoice_id' in result:
+        status, result = valid_result
+        if status == 200 and 'invoice_id' in result:
             invoice_id = result['invoice_id']
             self.created_resources['invoices'].append(invoice_id)
             self.log_test("Valid quantity invoice creation", True, f"- Invoice ID: {invoice_id}")
         else:
-            self.log_test("Valid quantity invoice creation", False, f"- {result}")
+            self.log_test("Valid quantity invoice creation", False, f"- Status {status}: {result}")
         
         return True
 
-    def test_abg_release_mapping_table(self):
+    async def test_abg_release_mapping_table(self):
         """Test B: ABG Release Mapping Table Tests"""
         print("\n🎯 Testing B: ABG Release Mapping Table...")
         
-        if not self.created_resources['projects']:
-            self.log_test("ABG mapping setup", False, "- No test project available")
-            return False
-        
-        project_id = self.created_resources['projects'][0]
-        
         # Test getting RA tracking data (ABG Release Mapping)
-        success, result = self.make_request('GET', f'projects/{project_id}/ra-tracking')
+        status, result = await self._get(f'projects/{self.project_id}/ra-tracking')
         
-        if success:
+        if status == 200:
             has_project_id = 'project_id' in result
             has_items = 'items' in result
             items_count = len(result.get('items', []))
@@ -315,285 +429,239 @@ class UserIssuesFinalTester:
             
             return True
         else:
-            self.log_test("ABG Release Mapping table", False, f"- {result}")
+            self.log_test("ABG Release Mapping table", False, f"- Status {status}: {result}")
             return False
 
-    def test_super_admin_invoice_design(self):
+    async def test_super_admin_invoice_design(self):
         """Test C: Super Admin Invoice Design Tests"""
         print("\n🎯 Testing C: Super Admin Invoice Design...")
         
-        if not self.user_data or self.user_data.get('role') != 'super_admin':
-            self.log_test("Super admin check", False, "- Not super admin")
-            return False
+        # Test saving custom design configuration
+        design_config = {
+            "company_logo_url": "https://example.com/logo.png",
+            "primary_color": "#127285",
+            "secondary_color": "#f8f9fa", 
+            "font_family": "Helvetica",
+            "header_template": "ACTIVUS INDUSTRIAL DESIGN & BUILD LLP",
+            "footer_template": "Thank you for your business!",
+            "terms_conditions": "Payment within 30 days",
+            "show_gst_breakdown": True,
+            "show_company_details": True,
+            "created_by": self.user_data['id']
+        }
         
-        # Test accessing invoice design configuration endpoint
-        success, result = self.make_request('GET', 'admin/invoice-design-config')
+        # Reading and saving the config are independent, so they go out as one batch
+        (status, result), (save_status, save_result) = await self.batch_request([
+            ('GET', 'admin/invoice-design-config', None),
+            ('POST', 'admin/invoice-design-config', design_config)
+        ])
         
-        if success:
+        if status == 200:
             self.log_test("Access invoice design config", True, "- Super admin can access design config")
             
-            # Test saving custom design configuration
-            design_config = {
-                "company_logo_url": "https://example.com/logo.png",
-                "primary_color": "#127285",
-                "secondary_color": "#f8f9fa", 
-                "font_family": "Helvetica",
-                "header_template": "ACTIVUS INDUSTRIAL DESIGN & BUILD LLP",
-                "footer_template": "Thank you for your business!",
-                "terms_conditions": "Payment within 30 days",
-                "show_gst_breakdown": True,
-                "show_company_details": True,
-                "created_by": self.user_data['id']
-            }
-            
-            success, save_result = self.make_request('POST', 'admin/invoice-design-config', design_config)
-            if success:
+            if save_status == 200:
                 config_id = save_result.get('config_id')
                 self.log_test("Save custom design config", True, f"- Config ID: {config_id}")
                 
-                # Test updating design config
+                # Test updating design config (needs the config_id from the save)
                 update_config = {
                     "primary_color": "#ff6b35",
                     "show_gst_breakdown": False
                 }
                 
-                success, update_result = self.make_request('PUT', f'admin/invoice-design-config/{config_id}', update_config)
-                self.log_test("Update design config", success, "- Design config updated")
+                status, update_result = await self._put_json(f'admin/invoice-design-config/{config_id}', update_config)
+                self.log_test("Update design config", status == 200, "- Design config updated")
                 
             else:
-                self.log_test("Save custom design config", False, f"- {save_result}")
+                self.log_test("Save custom design config", False, f"- Status {save_status}: {save_result}")
             
             return True
         else:
-            self.log_test("Access invoice design config", False, f"- {result}")
+            self.log_test("Access invoice design config", False, f"- Status {status}: {result}")
             return False
 
-    def test_backend_security_validation(self):
+    async def test_backend_security_validation(self):
         """Test D: Backend Security Tests - Quantity validation on endpoints"""
         print("\n🎯 Testing D: Backend Security Validation...")
         
-        if not self.created_resources['projects']:
-            self.log_test("Security validation setup", False, "- No test project available")
-            return False
-        
-        project_id = self.created_resources['projects'][0]
-        client_id = self.created_resources['clients'][0]
-        
         # Test 1: Regular invoice endpoint quantity validation
-        print("  🔒 Test 1: Regular invoice endpoint security")
+        security_test_invoice = {**self._invoice_template, "items": [
+            {**self._item_template, "description": "Foundation Work - Security Test",
+             "quantity": 50.0, "amount": 250000.0}  # Trying to bill 50 when only 5 remaining
+        ]}
         
-        security_test_invoice = {
-            "project_id": project_id,
-            "project_name": "User Issues Test Project",
-            "client_id": client_id,
-            "client_name": "Test Client for User Issues", 
-            "invoice_type": "tax_invoice",
-            "created_by": self.user_data['id'],
-            "items": [
-                {
-                    "boq_item_id": "1",
-                    "serial_number": "1",
-                    "description": "Foundation Work - Security Test",
-                    "unit": "Cum",
-                    "quantity": 50.0,  # Trying to bill 50 when only 5 remaining
-                    "rate": 5000.0,
-                    "amount": 250000.0,
-                    "gst_rate": 18.0
-                }
-            ]
-        }
+        # Test 2: Enhanced invoice endpoint quantity validation
+        enhanced_security_test = {**self._invoice_template, "invoice_items": [
+            {**self._item_template, "description": "Foundation Work - Enhanced Security Test",
+             "quantity": 25.0, "amount": 125000.0}  # Trying to bill 25 when only 5 remaining
+        ]}
         
-        success, result = self.make_request('POST', 'invoices', security_test_invoice, expected_status=400)
-        if success:
+        # Both endpoints are probed with the same over-quantity, so send them together
+        regular_result, enhanced_result = await asyncio.gather(
+            self._post_json('invoices', security_test_invoice),
+            self._post_json('invoices/enhanced', enhanced_security_test)
+        )
+        
+        print("  🔒 Test 1: Regular invoice endpoint security")
+        status, result = regular_result
+        if status == 400:
             self.log_test("Regular invoice security validation", True, "- Over-quantity blocked by security validation")
+        elif status == 200:
+            self.log_test("Regular invoice security validation", False, "- SECURITY BREACH: Over-quantity invoice created!")
         else:
-            # Check if invoice was created (security failure)
-            success_created, created_result = self.make_request('POST', 'invoices', security_test_invoice)
-            if success_created:
-                self.log_test("Regular invoice security validation", False, "- SECURITY BREACH: Over-quantity invoice created!")
-            else:
-                self.log_test("Regular invoice security validation", True, "- Security validation working")
+            self.log_test("Regular invoice security validation", False, f"- Unexpected status {status}: {result}")
         
-        # Test 2: Enhanced invoice endpoint quantity validation
         print("  🔒 Test 2: Enhanced invoice endpoint security")
-        
-        enhanced_security_test = {
-            "project_id": project_id,
-            "project_name": "User Issues Test Project",
-            "client_id": client_id,
-            "client_name": "Test Client for User Issues",
-            "invoice_type": "tax_invoice",
-            "created_by": self.user_data['id'],
-            "invoice_items": [
-                {
-                    "boq_item_id": "1",
-                    "serial_number": "1",
-                    "description": "Foundation Work - Enhanced Security Test",
-                    "unit": "Cum", 
-                    "quantity": 25.0,  # Trying to bill 25 when only 5 remaining
-                    "rate": 5000.0,
-                    "amount": 125000.0
-                }
-            ]
-        }
-        
-        success, result = self.make_request('POST', 'invoices/enhanced', enhanced_security_test, expected_status=400)
-        if success:
+        status, result = enhanced_result
+        if status == 400:
             self.log_test("Enhanced invoice security validation", True, "- Over-quantity blocked by enhanced validation")
+        elif status == 200:
+            self.log_test("Enhanced invoice security validation", False, "- SECURITY BREACH: Enhanced over-quantity invoice created!")
         else:
-            # Check if invoice was created (security failure)
-            success_created, created_result = self.make_request('POST', 'invoices/enhanced', enhanced_security_test)
-            if success_created:
-                self.log_test("Enhanced invoice security validation", False, "- SECURITY BREACH: Enhanced over-quantity invoice created!")
-            else:
-                self.log_test("Enhanced invoice security validation", True, "- Enhanced security validation working")
+            self.log_test("Enhanced invoice security validation", False, f"- Unexpected status {status}: {result}")
         
         # Test 3: Flexible description matching
         print("  🔒 Test 3: Flexible description matching")
         
-        flexible_description_test = {
-            "project_id": project_id,
-            "project_name": "User Issues Test Project",
-            "client_id": client_id,
-            "client_name": "Test Client for User Issues",
-            "invoice_type": "tax_invoice", 
-            "created_by": self.user_data['id'],
-            "items": [
-                {
-                    "boq_item_id": "1",
-                    "serial_number": "1",
-                    "description": "Foundation Work - First Invoice",  # Variation of "Foundation Work"
-                    "unit": "Cum",
-                    "quantity": 2.0,  # Valid quantity
-                    "rate": 5000.0,
-                    "amount": 10000.0,
-                    "gst_rate": 18.0
-                }
-            ]
-        }
+        flexible_description_test = {**self._invoice_template, "items": [
+            # Variation of "Foundation Work", valid quantity
+            {**self._item_template, "description": "Foundation Work - First Invoice",
+             "quantity": 2.0, "amount": 10000.0}
+        ]}
         
-        success, result = self.make_request('POST', 'invoices', flexible_description_test)
-        if success and 'invoice_id' in result:
+        status, result = await self._post_json('invoices', flexible_description_test)
+        if status == 200 and 'invoice_id' in result:
             invoice_id = result['invoice_id']
             self.created_resources['invoices'].append(invoice_id)
             self.log_test("Flexible description matching", True, f"- Description variation matched, Invoice: {invoice_id}")
         else:
-            self.log_test("Flexible description matching", False, f"- {result}")
+            self.log_test("Flexible description matching", False, f"- Status {status}: {result}")
         
         # Test 4: BOQ billed_quantity updates
         print("  🔒 Test 4: BOQ billed_quantity updates")
         
-        # Get project to check if billed_quantity was updated
-        success, project_data = self.make_request('GET', f'projects/{project_id}')
-        if success and 'boq_items' in project_data:
-            boq_items = project_data['boq_items']
-            
-            # Check if any BOQ item has updated billed_quantity
-            updated_items = [item for item in boq_items if item.get('billed_quantity', 0) > 0]
-            
-            self.log_test("BOQ billed_quantity updates", len(updated_items) > 0,
-                        f"- {len(updated_items)} BOQ items have updated billed quantities")
+        # Stream the project and count BOQ items with an updated billed_quantity
+        status, updated_count = await self.count_streamed_items(
+            f'projects/{self.project_id}', 'boq_items.item',
+            lambda item: item.get('billed_quantity', 0) > 0)
+        if status == 200:
+            self.log_test("BOQ billed_quantity updates", updated_count > 0,
+                        f"- {updated_count} BOQ items have updated billed quantities")
         else:
-            self.log_test("BOQ billed_quantity updates", False, f"- Could not verify BOQ updates: {project_data}")
+            self.log_test("BOQ billed_quantity updates", False, f"- Could not verify BOQ updates: {updated_count}")
         
         return True
 
-    def test_error_messages_and_feedback(self):
+    async def test_error_messages_and_feedback(self):
         """Test clear error messages when exceeding quantities"""
         print("\n🎯 Testing Error Messages and User Feedback...")
         
-        if not self.created_resources['projects']:
-            self.log_test("Error message setup", False, "- No test project available")
-            return False
-        
-        project_id = self.created_resources['projects'][0]
-        client_id = self.created_resources['clients'][0]
-        
         # Test error message for over-quantity
-        over_quantity_test = {
-            "project_id": project_id,
-            "project_name": "User Issues Test Project",
-            "client_id": client_id,
-            "client_name": "Test Client for User Issues",
-            "invoice_type": "tax_invoice",
-            "created_by": self.user_data['id'],
-            "items": [
-                {
-                    "boq_item_id": "1",
-                    "serial_number": "1", 
-                    "description": "Foundation Work - Error Message Test",
-                    "unit": "Cum",
-                    "quantity": 15.0,  # Over quantity
-                    "rate": 5000.0,
-                    "amount": 75000.0,
-                    "gst_rate": 18.0
-                }
-            ]
-        }
+        over_quantity_test = {**self._invoice_template, "items": [
+            {**self._item_template, "description": "Foundation Work - Error Message Test",
+             "quantity": 15.0, "amount": 75000.0}  # Over quantity
+        ]}
         
-        success, result = self.make_request('POST', 'invoices', over_quantity_test, expected_status=400)
+        status, result = await self._post_json('invoices', over_quantity_test)
         
-        if success:
-            # Check if error message is clear and helpful
-            error_message = str(result)
-            has_quantity_info = any(keyword in error_message.lower() for keyword in 
-                                  ['quantity', 'balance', 'remaining', 'available', 'exceed'])
+        if status == 400:
+            # The server reports quantity overflows with a structured error detail
+            detail = result.get('detail') if isinstance(result, dict) else None
+            is_over_quantity = isinstance(detail, dict) and detail.get('code') == 'OVER_QUANTITY'
             
-            self.log_test("Clear error messages", has_quantity_info,
-                        f"- Error message contains quantity information: {has_quantity_info}")
+            self.log_test("Clear error messages", is_over_quantity,
+                        f"- Remaining: {detail.get('remaining')}, Requested: {detail.get('requested')}"
+                        if is_over_quantity else f"- Expected OVER_QUANTITY error detail, got: {result}")
         else:
-            self.log_test("Clear error messages", False, "- No error message received for over-quantity")
+            self.log_test("Clear error messages", False, f"- Expected 400 for over-quantity, got {status}")
         
         return True
 
-    def run_all_tests(self):
-        """Run all user issue tests"""
-        print("🎯 FINAL COMPREHENSIVE TESTING - ALL USER ISSUES RESOLVED")
-        print("=" * 70)
-        
-        # Authenticate
-        if not self.authenticate():
-            print("❌ Authentication failed. Cannot proceed with tests.")
+    async def run_all_tests(self):
+        """Run all user issue tests, closing the shared client when done"""
+        try:
+            return await self._run_tests()
+        finally:
+            await self.client.aclose()
+
+    async def _run_quantity_tests(self):
+        """Run input validation before security validation, whose BOQ check sees the invoice it creates"""
+        await self.test_input_validation_auto_correction()
+        await self.test_backend_security_validation()
+
+    async def _run_tests(self):
+        """Authenticate, create the fixture and run every test category"""
+        sys.stdout.write("🎯 FINAL COMPREHENSIVE TESTING - ALL USER ISSUES RESOLVED\n" + "=" * 70 + "\n")
+        
+        # One round trip when the server offers the fixture endpoint
+        if not await self.load_test_fixture():
+            # Authenticate
+            if not await self.authenticate():
+                print("❌ Authentication failed. Cannot proceed with tests.")
+                return False
+            
+            # Setup test data
+            if not await self.setup_test_data():
+                print("❌ Test data setup failed. Cannot proceed with tests.")
+                return False
+        
+        # Every category below relies on the fixture
+        if not (self.project_id and self.client_id):
+            print("❌ Test fixture is missing a project or client. Cannot proceed with tests.")
             return False
         
-        # Setup test data
-        if not self.setup_test_data():
-            print("❌ Test data setup failed. Cannot proceed with tests.")
-            return False
+        self._capabilities = {'super_admin': self.user_data.get('role') == 'super_admin'}
         
         # Run all test categories
-        print("\n" + "=" * 70)
-        print("🚀 RUNNING ALL USER ISSUE TESTS")
-        print("=" * 70)
+        sys.stdout.write("\n".join(["", "=" * 70, "🚀 RUNNING ALL USER ISSUE TESTS", "=" * 70]) + "\n")
+        
+        tests = [
+            self._run_quantity_tests,
+            self.test_abg_release_mapping_table,
+            self.test_error_messages_and_feedback
+        ]
+        # The invoice design endpoints are super admin only, so don't spend requests on other roles
+        if self._capabilities['super_admin']:
+            tests.append(self.test_super_admin_invoice_design)
+        else:
+            self.log_test("Super admin check", False, "- Not super admin, skipping invoice design tests")
         
-        self.test_input_validation_auto_correction()
-        self.test_abg_release_mapping_table()
-        self.test_super_admin_invoice_design()
-        self.test_backend_security_validation()
-        self.test_error_messages_and_feedback()
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_TESTS)
         
-        # Print final results
-        print("\n" + "=" * 70)
-        print("📊 FINAL TEST RESULTS")
-        print("=" * 70)
+        async def run_bounded(test):
+            async with semaphore:
+                return await test()
         
-        success_rate = (self.tests_passed / self.tests_run * 100) if self.tests_run > 0 else 0
+        # Finish in completion order so a fast failure is reported without waiting on slow tests;
+        # log_test never awaits, so the shared counters cannot interleave on the event loop
+        for finished in asyncio.as_completed([run_bounded(test) for test in tests]):
+            await finished
         
-        print(f"Total Tests Run: {self.tests_run}")
-        print(f"Tests Passed: {self.tests_passed}")
-        print(f"Tests Failed: {self.tests_run - self.tests_passed}")
-        print(f"Success Rate: {success_rate:.1f}%")
+        # Print final results in one write
+        success_rate = (self.tests_passed / self.tests_run * 100) if self.tests_run > 0 else 0
         
         if success_rate >= 90:
-            print("🎉 EXCELLENT: All user issues have been successfully resolved!")
+            verdict = "🎉 EXCELLENT: All user issues have been successfully resolved!"
         elif success_rate >= 75:
-            print("✅ GOOD: Most user issues resolved, minor issues remain")
+            verdict = "✅ GOOD: Most user issues resolved, minor issues remain"
         else:
-            print("⚠️ NEEDS ATTENTION: Critical user issues still exist")
+            verdict = "⚠️ NEEDS ATTENTION: Critical user issues still exist"
+        
+        sys.stdout.write("\n".join([
+            "",
+            "=" * 70,
+            "📊 FINAL TEST RESULTS",
+            "=" * 70,
+            f"Total Tests Run: {self.tests_run}",
+            f"Tests Passed: {self.tests_passed}",
+            f"Tests Failed: {self.tests_run - self.tests_passed}",
+            f"Success Rate: {success_rate:.1f}%",
+            verdict
+        ]) + "\n")
         
         return success_rate >= 75
 
 if __name__ == "__main__":
     tester = UserIssuesFinalTester()
-    success = tester.run_all_tests()
+    success = asyncio.run(tester.run_all_tests())
     sys.exit(0 if success else 1)
\ No newline at end of file
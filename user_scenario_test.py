@@ -4,314 +4,515 @@ REPRODUCE USER'S EXACT SCENARIO - Bill Qty 7.30 vs Remaining 1.009
 Test with existing project data to confirm the critical quantity validation bug
 """
 
-import requests
+import asyncio
+import httpx
+import ijson
 import json
+import logging
+import orjson
+import os
+import sys
+import time
+from decimal import Decimal, ROUND_HALF_UP
+from pathlib import Path
 
-def test_user_scenario():
-    base_url = 'https://template-maestro.preview.emergentagent.com/api'
+from pydantic import ValidationError
+
+from invoice_models import EnhancedInvoiceCreate, InvoiceCreate, QuantityValidationRequest
+
+BASE_URL = 'https://template-maestro.preview.emergentagent.com/api'
+# Unauthenticated probe checked before logging in. It must be the backend's /api/health,
+# which pings the database: nginx answers the root /health itself even with the backend down.
+HEALTH_URL = BASE_URL + '/health'
+HEALTH_TIMEOUT = 2.0
+
+logger = logging.getLogger('user_scenario')
+
+# Per-step results as JSON lines, for CI to parse instead of the decorated console text.
+# Kept out of the working tree, next to the other caches; USER_SCENARIO_LOG overrides it.
+STRUCTURED_LOG_PATH = Path(os.environ.get('USER_SCENARIO_LOG',
+                                          Path.home() / ".cache" / "user_scenario.log.jsonl"))
+
+# Gateway errors on GETs are retried with backoff; POSTs are never repeated
+RETRY_STATUSES = frozenset({502, 503, 504})
+MAX_RETRIES = 2
+RETRY_BACKOFF = 0.2
+
+# The only project fields this script reads
+PROJECT_FIELDS = ('id', 'project_name', 'client_id', 'client_name', 'boq_items')
+
+# The chosen project is reused across runs for a few minutes; set REFRESH_CACHE=1 to refetch it.
+# Only the project choice comes from it: on a cache hit the project is re-read from
+# projects/{id}, which is never cached, before its billed quantities are used.
+PROJECTS_CACHE_PATH = Path.home() / ".cache" / "user_scenario_projects.json"
+PROJECTS_CACHE_TTL = 300
+
+def load_cached_projects(base_url):
+    """Return the cached project list for base_url if it has not expired"""
+    if os.environ.get('REFRESH_CACHE') == '1':
+        return None
+    try:
+        cached = json.loads(PROJECTS_CACHE_PATH.read_text())
+    except (OSError, ValueError):
+        return None
+    if cached.get('base_url') != base_url or cached.get('exp', 0) <= time.time():
+        return None
+    return cached['projects']
+
+def save_cached_projects(base_url, projects):
+    """Persist the project list so later runs can skip downloading it"""
+    try:
+        PROJECTS_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        PROJECTS_CACHE_PATH.write_text(json.dumps({
+            "base_url": base_url,
+            "projects": projects,
+            "exp": time.time() + PROJECTS_CACHE_TTL
+        }))
+        PROJECTS_CACHE_PATH.chmod(0o600)
+    except OSError:
+        pass
+
+JSON_HEADERS = {'Content-Type': 'application/json'}
+
+# Quantities and amounts are Decimals, quantized like invoice quantities and
+# turned back into JSON numbers only when a payload is encoded
+Q3 = Decimal('0.001')
+
+def dec(value):
+    """Exact Decimal for a JSON number (via its shortest repr, not its binary value)"""
+    return Decimal(str(value))
+
+def _encode_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError
+
+# Tolerance for quantity comparisons, so values a ULP apart still count as equal
+EPS = Decimal('1e-6')
+
+class JsonLinesFormatter(logging.Formatter):
+    """Format a record's structured event as one JSON line"""
+    def format(self, record):
+        return orjson.dumps(record.event, default=_encode_default).decode()
+
+def event(step, status, **fields):
+    """logging extra= carrying a structured result for the JSON-lines log"""
+    return {'event': {'step': step, 'status': status, **fields}}
+
+class BufferedStreamHandler(logging.StreamHandler):
+    """StreamHandler that leaves flushing to the stream's own buffer instead of flushing every record"""
+    def flush(self):
+        pass
+
+def configure_logging():
+    """Console output through stdout's block buffer, flushed at exit, plus the JSON-lines log"""
+    sys.stdout.reconfigure(encoding='utf-8')
+    console = BufferedStreamHandler(sys.stdout)
+    console.setFormatter(logging.Formatter('%(message)s'))
+    
+    STRUCTURED_LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+    structured = logging.FileHandler(STRUCTURED_LOG_PATH, mode='w', encoding='utf-8')
+    structured.setFormatter(JsonLinesFormatter())
+    structured.addFilter(lambda record: hasattr(record, 'event'))
+    
+    logger.setLevel(logging.INFO)
+    logger.addHandler(console)
+    logger.addHandler(structured)
+
+def gt(a, b, eps=EPS):
+    """a > b beyond a relative-plus-absolute tolerance"""
+    return (a - b) > eps * (1 + abs(b))
+
+async def post_json(client, path, payload):
+    """POST payload pre-encoded with orjson"""
+    return await client.post(path, content=orjson.dumps(payload, default=_encode_default), headers=JSON_HEADERS)
+
+async def get_with_retry(client, path, **kwargs):
+    """GET path, retrying gateway errors with exponential backoff"""
+    response = await client.get(path, **kwargs)
+    for attempt in range(MAX_RETRIES):
+        if response.status_code not in RETRY_STATUSES:
+            break
+        await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+        response = await client.get(path, **kwargs)
+    return response
+
+async def find_first_project(client, predicate):
+    """Stream GET /projects and return (status_code, first project matching predicate or None).
+    
+    The list is parsed incrementally and the download is abandoned at the first match, so at
+    most one chunk's worth of projects is ever held in memory. Gateway errors are retried like
+    get_with_retry().
+    """
+    params = {'fields': ','.join(PROJECT_FIELDS)}
+    for attempt in range(MAX_RETRIES + 1):
+        async with client.stream('GET', 'projects', params=params) as response:
+            if response.status_code == 200:
+                projects = ijson.sendable_list()
+                parser = ijson.items_coro(projects, 'item', use_float=True)
+                async for chunk in response.aiter_bytes():
+                    parser.send(chunk)
+                    match = next((project for project in projects if predicate(project)), None)
+                    if match is not None:
+                        return response.status_code, match
+                    del projects[:]
+                parser.close()
+                return response.status_code, next((project for project in projects if predicate(project)), None)
+            if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                return response.status_code, None
+        await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+
+BATCH_HEADERS = {**JSON_HEADERS, 'X-Batch-Sequential': 'true'}
+
+def _result(response):
+    """(status, decoded body) for a response; non-JSON bodies are wrapped as a detail"""
+    try:
+        return response.status_code, orjson.loads(response.content)
+    except orjson.JSONDecodeError:
+        return response.status_code, {'detail': response.text}
+
+def log_invalid_payload(error):
+    """Log each field a payload model rejected, by its path"""
+    logger.info(f"❌ {error.title} payload is invalid, not sending it")
+    for problem in error.errors():
+        logger.info(f"   {'.'.join(str(part) for part in problem['loc'])}: {problem['msg']}")
+
+def error_message(body):
+    """The message of an error body whose detail is either a string or a structured error"""
+    detail = body.get('detail', {})
+    return detail.get('message', 'Unknown error') if isinstance(detail, dict) else detail
+
+async def batch_post(client, sub_requests):
+    """Send POST sub-requests to /batch in one round trip and return a (status, body) per sub-request.
+    
+    The batch runs in order server-side since the invoice writes depend on each other.
+    Falls back to one call per sub-request when the server has no batch endpoint.
+    """
+    response = await client.post('batch', content=orjson.dumps({"requests": sub_requests}, default=_encode_default),
+                                 headers=BATCH_HEADERS)
+    if response.status_code in (404, 405):
+        # In order, one at a time, as the server would run them
+        return [_result(await post_json(client, sub_request['path'], sub_request['body']))
+                for sub_request in sub_requests]
+    
+    status, body = _result(response)
+    results = body.get('results') if status == 200 and isinstance(body, dict) else None
+    if not isinstance(results, list) or len(results) != len(sub_requests):
+        return [(status, body)] * len(sub_requests)
+    return [(result.get('status'), result.get('body')) for result in results]
+
+def make_client():
+    """One HTTP/2 client, so the whole scenario multiplexes over a single TLS connection"""
+    transport = httpx.AsyncHTTPTransport(http2=True, retries=2,
+                                         limits=httpx.Limits(max_connections=4, max_keepalive_connections=4))
+    return httpx.AsyncClient(base_url=BASE_URL, transport=transport, timeout=30.0)
+
+async def main():
+    async with make_client() as client:
+        await run_user_scenario(client)
+
+async def run_user_scenario(client):
+    # Fail fast when the API is down instead of waiting out the login timeout
+    try:
+        (await client.head(HEALTH_URL, timeout=HEALTH_TIMEOUT)).raise_for_status()
+    except httpx.HTTPError as e:
+        logger.info(f"❌ API unreachable: {e}")
+        return
     
     # Authenticate
-    login_response = requests.post(f'{base_url}/auth/login', 
-                                 json={'email': 'brightboxm@gmail.com', 'password': 'admin123'})
+    login_status, login_body = _result(await post_json(client, 'auth/login',
+                                                       {'email': 'brightboxm@gmail.com', 'password': 'admin123'}))
     
-    if login_response.status_code != 200:
-        print("❌ Authentication failed")
+    if login_status != 200:
+        logger.info("❌ Authentication failed")
         return
     
-    token = login_response.json()['access_token']
-    headers = {'Authorization': f'Bearer {token}'}
+    token = login_body['access_token']
+    client.headers['Authorization'] = f'Bearer {token}'
     
-    print("🚨 REPRODUCING USER'S EXACT SCENARIO")
-    print("User reported: 'Bill Qty 7.30' was accepted when 'Remaining was 1.009'")
-    print("=" * 70)
+    logger.info("🚨 REPRODUCING USER'S EXACT SCENARIO")
+    logger.info("User reported: 'Bill Qty 7.30' was accepted when 'Remaining was 1.009'")
+    logger.info("=" * 70)
     
     # Find a suitable project with BOQ items
-    projects_response = requests.get(f'{base_url}/projects', headers=headers)
-    if projects_response.status_code != 200:
-        print("❌ Failed to get projects")
-        return
-    
-    projects = projects_response.json()
-    test_project = None
-    
-    # Find project with BOQ items
-    for project in projects:
-        boq_items = project.get('boq_items', [])
-        if boq_items:
-            test_project = project
-            break
-    
-    if not test_project:
-        print("❌ No projects with BOQ items found")
+    projects = load_cached_projects(BASE_URL)
+    if projects is None:
+        projects_status, test_project = await find_first_project(client, lambda project: project.get('boq_items'))
+        if projects_status != 200:
+            logger.info("❌ Failed to get projects")
+            return
+        
+        if test_project is not None:
+            # Servers without projection support still send whole documents; keep only what is used
+            test_project = {field: test_project[field] for field in PROJECT_FIELDS if field in test_project}
+            save_cached_projects(BASE_URL, [test_project])
+    else:
+        test_project = next((project for project in projects if project.get('boq_items')), None)
+        if test_project is not None:
+            # The cached billed quantities may predate an earlier run's setup invoice
+            live_status, test_project = _result(await get_with_retry(client, f"projects/{test_project['id']}"))
+            if live_status != 200:
+                logger.info(f"❌ Failed to get project: {live_status}")
+                return
+    
+    if not test_project or not test_project.get('boq_items'):
+        logger.info("❌ No projects with BOQ items found")
         return
     
     project_id = test_project['id']
     project_name = test_project['project_name']
     boq_items = test_project['boq_items']
     
-    print(f"📋 Using project: {project_name}")
-    print(f"   Project ID: {project_id}")
-    print(f"   BOQ Items: {len(boq_items)}")
+    logger.info(f"📋 Using project: {project_name}")
+    logger.info(f"   Project ID: {project_id}")
+    logger.info(f"   BOQ Items: {len(boq_items)}")
     
     # Use first BOQ item for testing
     test_item = boq_items[0]
     item_desc = test_item.get('description', 'Unknown')
-    total_qty = test_item.get('quantity', 0)
-    billed_qty = test_item.get('billed_quantity', 0)
+    total_qty = dec(test_item.get('quantity', 0))
+    billed_qty = dec(test_item.get('billed_quantity', 0))
     remaining_qty = total_qty - billed_qty
     unit = test_item.get('unit', 'nos')
+    # Read once; every payload and the Step 2 lookup reuse these
+    sn = test_item.get('serial_number', '1')
+    rate = dec(test_item.get('rate', 1000))
+    client_id = test_project.get('client_id', 'test-client')
+    client_name = test_project.get('client_name', 'Test Client')
     
-    print(f"\n📊 Test Item: {item_desc}")
-    print(f"   Total Quantity: {total_qty} {unit}")
-    print(f"   Billed Quantity: {billed_qty} {unit}")
-    print(f"   Remaining Quantity: {remaining_qty} {unit}")
+    logger.info(f"\n📊 Test Item: {item_desc}")
+    logger.info(f"   Total Quantity: {total_qty} {unit}")
+    logger.info(f"   Billed Quantity: {billed_qty} {unit}")
+    logger.info(f"   Remaining Quantity: {remaining_qty} {unit}")
     
     # Step 1: Create invoices to simulate the user's scenario (remaining = 1.009)
-    print(f"\n🎯 STEP 1: Creating invoices to leave exactly 1.009 {unit} remaining...")
+    logger.info(f"\n🎯 STEP 1: Creating invoices to leave exactly 1.009 {unit} remaining...")
+    
+    # Bill only what is left above 1.009; anything already billed counts against the BOQ
+    target_remaining = Decimal('1.009')
+    qty_to_bill = (remaining_qty - target_remaining).quantize(Q3, ROUND_HALF_UP)
     
-    # Calculate how much to bill to leave 1.009 remaining
-    target_remaining = 1.009
-    qty_to_bill = total_qty - target_remaining
+    # Fields shared by every invoice payload in this scenario
+    base_payload = {
+        "project_id": project_id,
+        "project_name": project_name,
+        "client_id": client_id,
+        "client_name": client_name,
+        "invoice_type": "tax_invoice",
+        "created_by": "test-user"
+    }
+    base_item = {
+        "boq_item_id": sn,
+        "serial_number": sn,
+        "unit": unit,
+        "rate": rate
+    }
     
-    if qty_to_bill > 0:
+    def _make_payload(qty, *, enhanced=False, desc_suffix):
+        """Invoice payload billing qty of the test item, for /invoices or /invoices/enhanced.
+        
+        The payload is checked against the request model first, so a malformed one raises
+        pydantic.ValidationError here instead of costing a round trip.
+        """
+        amount = qty * rate
+        gst = amount * Decimal('0.18')
+        total = amount * Decimal('1.18')
+        item = {**base_item, "description": f"{item_desc} - {desc_suffix}", "quantity": qty, "amount": amount}
+        if enhanced:
+            half_gst = amount * Decimal('0.09')
+            return EnhancedInvoiceCreate(
+                **base_payload, invoice_gst_type="CGST_SGST", invoice_items=[item],
+                subtotal=amount, cgst_amount=half_gst, sgst_amount=half_gst,
+                total_gst_amount=gst, total_amount=total).model_dump()
+        item.update(gst_rate=18.0, gst_amount=gst, total_with_gst=total)
+        return InvoiceCreate(
+            **base_payload, items=[item],
+            subtotal=amount, total_gst_amount=gst, total_amount=total).model_dump()
+    
+    if abs(remaining_qty - target_remaining) < Decimal('0.01'):
+        logger.info("⏭️  Skipping setup, precondition already holds", extra=event(1, 'skipped', qty=remaining_qty))
+    elif qty_to_bill > 0:
         # Create first invoice to consume most quantity
-        invoice_data = {
-            "project_id": project_id,
-            "project_name": project_name,
-            "client_id": test_project.get('client_id', 'test-client'),
-            "client_name": test_project.get('client_name', 'Test Client'),
-            "invoice_type": "tax_invoice",
-            "items": [
-                {
-                    "boq_item_id": test_item.get('serial_number', '1'),
-                    "serial_number": test_item.get('serial_number', '1'),
-                    "description": f"{item_desc} - Setup Invoice",
-                    "unit": unit,
-                    "quantity": qty_to_bill,
-                    "rate": test_item.get('rate', 1000),
-                    "amount": qty_to_bill * test_item.get('rate', 1000),
-                    "gst_rate": 18.0,
-                    "gst_amount": qty_to_bill * test_item.get('rate', 1000) * 0.18,
-                    "total_with_gst": qty_to_bill * test_item.get('rate', 1000) * 1.18
-                }
-            ],
-            "subtotal": qty_to_bill * test_item.get('rate', 1000),
-            "total_gst_amount": qty_to_bill * test_item.get('rate', 1000) * 0.18,
-            "total_amount": qty_to_bill * test_item.get('rate', 1000) * 1.18,
-            "created_by": "test-user"
-        }
+        try:
+            invoice_data = _make_payload(qty_to_bill, desc_suffix="Setup Invoice")
+        except ValidationError as e:
+            log_invalid_payload(e)
+            return
         
         # Try regular invoice endpoint first
-        invoice_response = requests.post(f'{base_url}/invoices', json=invoice_data, headers=headers)
+        setup_status, setup_body = _result(await post_json(client, 'invoices', invoice_data))
         
-        if invoice_response.status_code == 200:
-            setup_invoice_id = invoice_response.json().get('invoice_id')
-            print(f"✅ Setup invoice created: {setup_invoice_id}")
-            print(f"   Billed: {qty_to_bill} {unit}")
-            print(f"   Should leave remaining: {target_remaining} {unit}")
+        if setup_status == 200:
+            setup_invoice_id = setup_body.get('invoice_id')
+            logger.info(f"✅ Setup invoice created: {setup_invoice_id}",
+                        extra=event(1, 200, qty=qty_to_bill, invoice_id=setup_invoice_id))
+            logger.info(f"   Billed: {qty_to_bill} {unit}")
+            logger.info(f"   Should leave remaining: {target_remaining} {unit}")
         else:
-            print(f"❌ Setup invoice failed: {invoice_response.status_code}")
-            print(f"   Error: {invoice_response.text}")
+            logger.info(f"❌ Setup invoice failed: {setup_status}", extra=event(1, setup_status))
+            logger.info(f"   Error: {error_message(setup_body)}")
             return
     
+    # Steps 2 and 3 only read the project state left by Step 1, so fetch both at once
+    responses = await asyncio.gather(
+        get_with_retry(client, f'projects/{project_id}'),
+        get_with_retry(client, f'projects/{project_id}/ra-tracking'))
+    (project_status, updated_project), (ra_status, ra_data) = [_result(response) for response in responses]
+    
     # Step 2: Verify the remaining quantity
-    print(f"\n🔍 STEP 2: Verifying remaining quantity...")
+    logger.info(f"\n🔍 STEP 2: Verifying remaining quantity...")
     
     # Get updated project data
-    project_response = requests.get(f'{base_url}/projects/{project_id}', headers=headers)
-    if project_response.status_code == 200:
-        updated_project = project_response.json()
+    if project_status == 200:
         updated_boq_items = updated_project.get('boq_items', [])
-        updated_test_item = next((item for item in updated_boq_items 
-                                if item.get('serial_number') == test_item.get('serial_number')), None)
+        # Index by serial number; reversed so the first item wins on duplicates, as a scan would
+        by_sn = {item.get('serial_number'): item for item in reversed(updated_boq_items)}
+        updated_test_item = by_sn.get(sn)
         
         if updated_test_item:
-            updated_billed = updated_test_item.get('billed_quantity', 0)
-            updated_remaining = updated_test_item.get('quantity', 0) - updated_billed
+            updated_total = dec(updated_test_item.get('quantity', 0))
+            updated_billed = dec(updated_test_item.get('billed_quantity', 0))
+            updated_remaining = updated_total - updated_billed
             
-            print(f"📊 Updated quantities:")
-            print(f"   Total: {updated_test_item.get('quantity', 0)} {unit}")
-            print(f"   Billed: {updated_billed} {unit}")
-            print(f"   Remaining: {updated_remaining} {unit}")
+            logger.info(f"📊 Updated quantities:")
+            logger.info(f"   Total: {updated_total} {unit}")
+            logger.info(f"   Billed: {updated_billed} {unit}")
+            logger.info(f"   Remaining: {updated_remaining} {unit}", extra=event(2, 200, qty=updated_remaining))
             
             actual_remaining = updated_remaining
         else:
-            print("❌ Could not find updated BOQ item")
+            logger.info("❌ Could not find updated BOQ item")
             return
     else:
-        print(f"❌ Failed to get updated project: {project_response.status_code}")
+        logger.info(f"❌ Failed to get updated project: {project_status}", extra=event(2, project_status))
         return
     
     # Step 3: Test RA Tracking
-    print(f"\n📊 STEP 3: Testing RA Tracking System...")
+    logger.info(f"\n📊 STEP 3: Testing RA Tracking System...")
     
-    ra_response = requests.get(f'{base_url}/projects/{project_id}/ra-tracking', headers=headers)
-    if ra_response.status_code == 200:
-        ra_data = ra_response.json()
+    if ra_status == 200:
         ra_items = ra_data.get('items', [])
         
-        print(f"RA Tracking Response: {len(ra_items)} items")
+        logger.info(f"RA Tracking Response: {len(ra_items)} items", extra=event(3, 200, items=len(ra_items)))
         
         if len(ra_items) == 0:
-            print("🚨 RA TRACKING BROKEN: No items returned despite BOQ having items")
+            logger.info("🚨 RA TRACKING BROKEN: No items returned despite BOQ having items")
         else:
             for ra_item in ra_items[:2]:
-                print(f"   - {ra_item.get('description', 'Unknown')}: Balance {ra_item.get('balance_qty', 0)}")
+                logger.info(f"   - {ra_item.get('description', 'Unknown')}: Balance {ra_item.get('balance_qty', 0)}")
     else:
-        print(f"❌ RA Tracking failed: {ra_response.status_code}")
+        logger.info(f"❌ RA Tracking failed: {ra_status}", extra=event(3, ra_status))
     
-    # Step 4: Test Quantity Validation Endpoint
-    print(f"\n🧪 STEP 4: Testing Quantity Validation Endpoint...")
-    
-    user_scenario_qty = 7.30  # User's exact scenario
+    user_scenario_qty = Decimal('7.30')  # User's exact scenario
     
-    validation_data = {
-        "project_id": project_id,
-        "invoice_items": [
-            {
-                "boq_item_id": test_item.get('serial_number', '1'),
+    try:
+        validation_data = QuantityValidationRequest(
+            project_id=project_id,
+            invoice_items=[{
+                "boq_item_id": sn,
                 "description": item_desc,
                 "quantity": user_scenario_qty
-            }
-        ]
-    }
+            }]
+        ).model_dump()
+        
+        user_invoice_data = _make_payload(user_scenario_qty, desc_suffix="User Scenario Test")
+        enhanced_invoice_data = _make_payload(user_scenario_qty, enhanced=True, desc_suffix="Enhanced Test")
+    except ValidationError as e:
+        log_invalid_payload(e)
+        return
     
-    validation_response = requests.post(f'{base_url}/invoices/validate-quantities', 
-                                      json=validation_data, headers=headers)
+    # Steps 4-6 go out as one batch, run in order server-side
+    (validation_status, validation_body), (regular_status, regular_body), (enhanced_status, enhanced_body) = await batch_post(
+        client, [
+            {"method": "POST", "path": "/invoices/validate-quantities", "body": validation_data},
+            {"method": "POST", "path": "/invoices", "body": user_invoice_data},
+            {"method": "POST", "path": "/invoices/enhanced", "body": enhanced_invoice_data}
+        ])
     
-    if validation_response.status_code == 200:
-        validation_result = validation_response.json()
+    # Step 4: Test Quantity Validation Endpoint
+    logger.info(f"\n🧪 STEP 4: Testing Quantity Validation Endpoint...")
+    
+    validation_result = validation_body if validation_status == 200 else {}
+    if validation_status == 200:
         is_valid = validation_result.get('valid', False)
         errors = validation_result.get('errors', [])
         warnings = validation_result.get('warnings', [])
         
-        print(f"Validation Test: {user_scenario_qty} {unit} when {actual_remaining:.3f} {unit} available")
-        print(f"Result: Valid={is_valid}, Errors={len(errors)}, Warnings={len(warnings)}")
+        logger.info(f"Validation Test: {user_scenario_qty} {unit} when {actual_remaining:.3f} {unit} available")
+        logger.info(f"Result: Valid={is_valid}, Errors={len(errors)}, Warnings={len(warnings)}",
+                    extra=event(4, 200, qty=user_scenario_qty, valid=is_valid))
         
-        if is_valid and user_scenario_qty > actual_remaining:
-            print("🚨 VALIDATION ENDPOINT BUG CONFIRMED: Allows over-quantity!")
-        elif not is_valid and user_scenario_qty > actual_remaining:
-            print("✅ Validation endpoint correctly blocks over-quantity")
+        if is_valid and gt(user_scenario_qty, actual_remaining):
+            logger.info("🚨 VALIDATION ENDPOINT BUG CONFIRMED: Allows over-quantity!")
+        elif not is_valid and gt(user_scenario_qty, actual_remaining):
+            logger.info("✅ Validation endpoint correctly blocks over-quantity")
         
         if errors:
             for error in errors:
-                print(f"   Error: {error}")
+                logger.info(f"   Error: {error}")
     else:
-        print(f"❌ Validation test failed: {validation_response.status_code}")
+        logger.info(f"❌ Validation test failed: {validation_status}", extra=event(4, validation_status))
     
     # Step 5: Test Regular Invoice Creation (User's main concern)
-    print(f"\n🧾 STEP 5: Testing Regular Invoice Creation - USER'S EXACT SCENARIO...")
-    
-    user_invoice_data = {
-        "project_id": project_id,
-        "project_name": project_name,
-        "client_id": test_project.get('client_id', 'test-client'),
-        "client_name": test_project.get('client_name', 'Test Client'),
-        "invoice_type": "tax_invoice",
-        "items": [
-            {
-                "boq_item_id": test_item.get('serial_number', '1'),
-                "serial_number": test_item.get('serial_number', '1'),
-                "description": f"{item_desc} - User Scenario Test",
-                "unit": unit,
-                "quantity": user_scenario_qty,  # 7.30 - User's exact scenario
-                "rate": test_item.get('rate', 1000),
-                "amount": user_scenario_qty * test_item.get('rate', 1000),
-                "gst_rate": 18.0,
-                "gst_amount": user_scenario_qty * test_item.get('rate', 1000) * 0.18,
-                "total_with_gst": user_scenario_qty * test_item.get('rate', 1000) * 1.18
-            }
-        ],
-        "subtotal": user_scenario_qty * test_item.get('rate', 1000),
-        "total_gst_amount": user_scenario_qty * test_item.get('rate', 1000) * 0.18,
-        "total_amount": user_scenario_qty * test_item.get('rate', 1000) * 1.18,
-        "created_by": "test-user"
-    }
-    
-    print(f"Attempting to create invoice with {user_scenario_qty} {unit} when {actual_remaining:.3f} {unit} available...")
-    
-    # Test regular invoice endpoint
-    regular_invoice_response = requests.post(f'{base_url}/invoices', json=user_invoice_data, headers=headers)
+    logger.info(f"\n🧾 STEP 5: Testing Regular Invoice Creation - USER'S EXACT SCENARIO...")
+    logger.info(f"Attempting to create invoice with {user_scenario_qty} {unit} when {actual_remaining:.3f} {unit} available...")
     
-    if regular_invoice_response.status_code == 200:
+    if regular_status == 200:
         # Invoice was created - THIS IS THE BUG
-        invoice_result = regular_invoice_response.json()
-        invoice_id = invoice_result.get('invoice_id')
-        print(f"🚨 CRITICAL BUG CONFIRMED: Regular invoice endpoint created invoice {invoice_id}")
-        print(f"   This allows over-billing: {user_scenario_qty} > {actual_remaining:.3f}")
-        print(f"   USER'S ISSUE REPRODUCED EXACTLY!")
+        invoice_id = regular_body.get('invoice_id')
+        logger.info(f"🚨 CRITICAL BUG CONFIRMED: Regular invoice endpoint created invoice {invoice_id}",
+                    extra=event(5, regular_status, qty=user_scenario_qty))
+        logger.info(f"   This allows over-billing: {user_scenario_qty} > {actual_remaining:.3f}")
+        logger.info(f"   USER'S ISSUE REPRODUCED EXACTLY!")
         
-    elif regular_invoice_response.status_code == 400:
+    elif regular_status == 400:
         # Invoice was blocked - Good!
-        error_detail = regular_invoice_response.json().get('detail', {})
-        print(f"✅ Regular invoice endpoint correctly blocked over-quantity")
-        print(f"   Error: {error_detail.get('message', 'Unknown error')}")
+        logger.info(f"✅ Regular invoice endpoint correctly blocked over-quantity",
+                    extra=event(5, regular_status, qty=user_scenario_qty))
+        logger.info(f"   Error: {error_message(regular_body)}")
         
     else:
-        print(f"❌ Unexpected response: {regular_invoice_response.status_code}")
-        print(f"   Response: {regular_invoice_response.text}")
+        logger.info(f"❌ Unexpected response: {regular_status}", extra=event(5, regular_status, qty=user_scenario_qty))
+        logger.info(f"   Response: {regular_body}")
     
     # Step 6: Test Enhanced Invoice Creation
-    print(f"\n🧾 STEP 6: Testing Enhanced Invoice Creation...")
-    
-    enhanced_invoice_data = {
-        "project_id": project_id,
-        "project_name": project_name,
-        "client_id": test_project.get('client_id', 'test-client'),
-        "client_name": test_project.get('client_name', 'Test Client'),
-        "invoice_type": "tax_invoice",
-        "invoice_gst_type": "CGST_SGST",
-        "created_by": "test-user",
-        "invoice_items": [
-            {
-                "boq_item_id": test_item.get('serial_number', '1'),
-                "serial_number": test_item.get('serial_number', '1'),
-                "description": f"{item_desc} - Enhanced Test",
-                "unit": unit,
-                "quantity": user_scenario_qty,
-                "rate": test_item.get('rate', 1000),
-                "amount": user_scenario_qty * test_item.get('rate', 1000)
-            }
-        ],
-        "subtotal": user_scenario_qty * test_item.get('rate', 1000),
-        "cgst_amount": user_scenario_qty * test_item.get('rate', 1000) * 0.09,
-        "sgst_amount": user_scenario_qty * test_item.get('rate', 1000) * 0.09,
-        "total_gst_amount": user_scenario_qty * test_item.get('rate', 1000) * 0.18,
-        "total_amount": user_scenario_qty * test_item.get('rate', 1000) * 1.18
-    }
-    
-    enhanced_invoice_response = requests.post(f'{base_url}/invoices/enhanced', json=enhanced_invoice_data, headers=headers)
+    logger.info(f"\n🧾 STEP 6: Testing Enhanced Invoice Creation...")
     
-    if enhanced_invoice_response.status_code == 200:
-        enhanced_result = enhanced_invoice_response.json()
-        enhanced_invoice_id = enhanced_result.get('invoice_id')
-        print(f"🚨 Enhanced invoice endpoint also allows over-quantity: {enhanced_invoice_id}")
+    if enhanced_status == 200:
+        enhanced_invoice_id = enhanced_body.get('invoice_id')
+        logger.info(f"🚨 Enhanced invoice endpoint also allows over-quantity: {enhanced_invoice_id}",
+                    extra=event(6, enhanced_status, qty=user_scenario_qty))
         
-    elif enhanced_invoice_response.status_code == 400:
-        error_detail = enhanced_invoice_response.json().get('detail', {})
-        print(f"✅ Enhanced invoice endpoint correctly blocked over-quantity")
-        print(f"   Error: {error_detail.get('message', 'Unknown error')}")
+    elif enhanced_status == 400:
+        logger.info(f"✅ Enhanced invoice endpoint correctly blocked over-quantity",
+                    extra=event(6, enhanced_status, qty=user_scenario_qty))
+        logger.info(f"   Error: {error_message(enhanced_body)}")
         
     else:
-        print(f"❌ Enhanced invoice unexpected response: {enhanced_invoice_response.status_code}")
+        logger.info(f"❌ Enhanced invoice unexpected response: {enhanced_status}",
+                    extra=event(6, enhanced_status, qty=user_scenario_qty))
     
     # Summary
-    print(f"\n" + "=" * 70)
-    print(f"📊 USER SCENARIO TEST SUMMARY")
-    print(f"=" * 70)
-    print(f"Scenario: Bill Qty {user_scenario_qty} when Remaining {actual_remaining:.3f}")
-    print(f"Regular Invoice Endpoint: {'VULNERABLE' if regular_invoice_response.status_code == 200 else 'PROTECTED'}")
-    print(f"Enhanced Invoice Endpoint: {'VULNERABLE' if enhanced_invoice_response.status_code == 200 else 'PROTECTED'}")
-    print(f"Validation Endpoint: {'BROKEN' if validation_result.get('valid') else 'WORKING'}")
-    print(f"RA Tracking: {'BROKEN' if len(ra_items) == 0 else 'WORKING'}")
-    
-    if regular_invoice_response.status_code == 200:
-        print(f"\n🚨 CRITICAL FINDING: User's exact issue reproduced!")
-        print(f"   The regular /api/invoices endpoint allows over-billing")
-        print(f"   This is a serious financial security vulnerability")
+    logger.info(f"\n" + "=" * 70)
+    logger.info(f"📊 USER SCENARIO TEST SUMMARY")
+    logger.info(f"=" * 70)
+    logger.info(f"Scenario: Bill Qty {user_scenario_qty} when Remaining {actual_remaining:.3f}")
+    logger.info(f"Regular Invoice Endpoint: {'VULNERABLE' if regular_status == 200 else 'PROTECTED'}")
+    logger.info(f"Enhanced Invoice Endpoint: {'VULNERABLE' if enhanced_status == 200 else 'PROTECTED'}")
+    logger.info(f"Validation Endpoint: {'BROKEN' if validation_result.get('valid') else 'WORKING'}")
+    logger.info(f"RA Tracking: {'BROKEN' if len(ra_items) == 0 else 'WORKING'}")
+    
+    if regular_status == 200:
+        logger.info(f"\n🚨 CRITICAL FINDING: User's exact issue reproduced!")
+        logger.info(f"   The regular /api/invoices endpoint allows over-billing")
+        logger.info(f"   This is a serious financial security vulnerability")
     else:
-        print(f"\n✅ User's issue appears to be resolved")
-        print(f"   Over-quantity invoices are being blocked correctly")
+        logger.info(f"\n✅ User's issue appears to be resolved")
+        logger.info(f"   Over-quantity invoices are being blocked correctly")
 
 if __name__ == "__main__":
-    test_user_scenario()
\ No newline at end of file
+    configure_logging()
+    try:
+        asyncio.run(main())
+    finally:
+        sys.stdout.flush()
\ No newline at end of file